@@ -6,19 +6,966 @@ Commands:
     ├ price         full name of token eg. bitcoin for multiple leave a space
     ├ value         current market price for token
     ├ graph         price graph for token(s)
+    ├ candles       candlestick chart for a token with optional sma/ema/rsi/bb overlays
+    ├ portfolio     value of my stored holdings
+    │ ├ set         set the amount held of a token (0 removes it)
+    │ └ top         guild leaderboard of portfolio values
+    ├ ticker        live price message for this channel (admin only)
+    │ └ stop        stop the ticker in this channel
+    ├ alert         notify me when a token crosses a price
+    ├ alerts        list my price alerts
+    ├ unalert       remove one of my price alerts
+    ├ markets       top tokens by market cap
     ├ tokens        WIP > list of all tokens on coingeko
     └ currencies    all conversion possible currencies for comparisons (default USD)
 """
 
 import asyncio
+import hashlib
+import heapq
+import io
+import json
+import math
+import os
+import re
+import time
+import typing
 
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime as dt
 
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib import dates as mdates
+from matplotlib.figure import Figure
 
+from aiohttp import ClientError
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
 from discord.ext import commands, tasks
-from discord import Embed, File
+from discord import Embed, File, Forbidden, HTTPException, NotFound
+
+
+_PROJECTIONS = {}
+
+
+def decode_json(body: bytes, fields=None, many=False):
+    """Decode a json payload, optionally keeping only some top level fields.
+
+    With fields set a json object decodes to a dict of just those fields, and with many
+    set a json array of objects decodes to a list of tuples in field order. When msgspec
+    is installed the other fields are skipped by the parser instead of being built first
+    and thrown away afterwards."""
+    if fields is None:
+        return msgspec.json.decode(body) if msgspec else json.loads(body)
+    fields = tuple(fields)
+    if not msgspec:
+        data = json.loads(body)
+        if many:
+            return [tuple(item.get(field) for field in fields) for item in data]
+        return {field: data.get(field) for field in fields}
+
+    decoder = _PROJECTIONS.get((fields, many))
+    if decoder is None:
+        struct = msgspec.defstruct('Projection', [(field, typing.Any, None) for field in fields])
+        decoder = msgspec.json.Decoder(typing.List[struct] if many else struct)
+        _PROJECTIONS[(fields, many)] = decoder
+    data = decoder.decode(body)
+    if many:
+        return [msgspec.structs.astuple(item) for item in data]
+    return msgspec.structs.asdict(data)
+
+
+class TokenIndex:
+    """Immutable lookup tables over the coingecko token and currency catalogs.
+
+    A new index is built whenever one of the catalogs refreshes and swapped in with a
+    single assignment, so commands never see a half built index. When several tokens share
+    a symbol the one with the best market cap rank owns it, unranked tokens fall back to
+    catalog order."""
+    __slots__ = ('tokens', 'ids', 'symbols', 'keys', 'currencies', 'ranks')
+
+    def __init__(self, tokens=(), currencies=(), ranks=None):
+        self.tokens = dict(tokens)
+        self.ranks = ranks or {}
+        self.ids = {token_id.lower(): token_id for token_id in self.tokens}
+        self.symbols = self._symbols(self.tokens.items())
+        self.keys = sorted(self.ids.keys() | self.symbols.keys())
+        self.currencies = frozenset(currency.lower() for currency in currencies)
+
+    def _rank(self, token_id):
+        return self.ranks.get(token_id, float('inf'))
+
+    def _symbols(self, tokens, symbols=None):
+        """add (id, symbol) pairs to a symbol table keeping the best ranked id per symbol"""
+        symbols = {} if symbols is None else symbols
+        for token_id, token_symbol in tokens:
+            key = token_symbol.lower()
+            owner = symbols.get(key)
+            if owner is None or self._rank(token_id) < self._rank(owner):
+                symbols[key] = token_id
+        return symbols
+
+    def _copy(self, **changes):
+        index = TokenIndex.__new__(TokenIndex)
+        for attr in self.__slots__:
+            setattr(index, attr, changes.get(attr, getattr(self, attr)))
+        return index
+
+    def with_currencies(self, currencies):
+        """copy of this index with a new currency catalog, token tables are shared"""
+        return self._copy(currencies=frozenset(currency.lower() for currency in currencies))
+
+    def with_ranks(self, ranks: dict):
+        """copy of this index with new market cap ranks ({token id: rank}), only the symbol
+        table is rebuilt"""
+        index = self._copy(ranks=ranks)
+        index.symbols = index._symbols(self.tokens.items())
+        return index
+
+    def diff(self, tokens: dict):
+        """return (added, removed) between this catalog and a freshly fetched one,
+        a token whose symbol changed shows up in both"""
+        added = {
+            token_id: token_symbol for token_id, token_symbol in tokens.items()
+            if self.tokens.get(token_id) != token_symbol
+        }
+        removed = {
+            token_id for token_id, token_symbol in self.tokens.items()
+            if tokens.get(token_id) != token_symbol
+        }
+        return added, removed
+
+    def apply(self, added: dict, removed: set):
+        """copy of this index with a token diff applied, untouched entries are not rebuilt"""
+        tokens = dict(self.tokens)
+        ids = dict(self.ids)
+        symbols = dict(self.symbols)
+        orphaned = set()
+        for token_id in removed:
+            token_symbol = tokens.pop(token_id).lower()
+            ids.pop(token_id.lower(), None)
+            if symbols.get(token_symbol) == token_id:
+                del symbols[token_symbol]
+                orphaned.add(token_symbol)
+        tokens.update(added)
+        if orphaned:
+            # hand a freed symbol to the next best token that carries it
+            self._symbols(
+                ((token_id, token_symbol) for token_id, token_symbol in tokens.items()
+                 if token_symbol.lower() in orphaned),
+                symbols
+            )
+        self._symbols(added.items(), symbols)
+        for token_id in added:
+            ids[token_id.lower()] = token_id
+        return self._copy(
+            tokens=tokens,
+            ids=ids,
+            symbols=symbols,
+            keys=sorted(ids.keys() | symbols.keys()),
+        )
+
+    def get(self, name_or_symbol: str):
+        """exact id or symbol lookup, when both match different tokens the better ranked one
+        wins and the id wins a tie"""
+        key = name_or_symbol.lower()
+        by_id = self.ids.get(key)
+        by_symbol = self.symbols.get(key)
+        if by_id and by_symbol and self._rank(by_symbol) < self._rank(by_id):
+            return by_symbol
+        return by_id or by_symbol
+
+    def startswith(self, prefix: str, limit: int = 25):
+        """token ids whose id or symbol starts with prefix, in alphabetical key order"""
+        prefix = prefix.lower()
+        found = []
+        for key in self.keys[bisect_left(self.keys, prefix):]:
+            if not key.startswith(prefix) or len(found) >= limit:
+                break
+            token_id = self.ids.get(key) or self.symbols[key]
+            if token_id not in found:
+                found.append(token_id)
+        return found
+
+
+# rendered charts are 1280px wide, two points per pixel column is already more than visible
+GRAPH_FIGSIZE = [12.8, 9.6]
+GRAPH_DPI = 100
+GRAPH_MAX_POINTS = int(GRAPH_FIGSIZE[0] * GRAPH_DPI) // 2
+
+
+def downsample(points, threshold: int = GRAPH_MAX_POINTS):
+    """Reduce an (n, 2) array of (x, y) rows to at most threshold rows keeping its shape.
+
+    Largest triangle style bucketing: the first and last rows are kept and every bucket in
+    between keeps the row forming the largest triangle with the means of its neighbouring
+    buckets. Using bucket means as anchors makes every bucket independent, so the whole
+    selection is a handful of numpy operations rather than a python loop."""
+    points = np.asarray(points, dtype=float)
+    size = len(points)
+    if threshold < 3 or size <= threshold:
+        return points
+    x, y = points[1:-1, 0], points[1:-1, 1]
+    buckets = threshold - 2
+    edges = np.linspace(0, size - 2, buckets + 1).astype(int)
+    bucket = np.searchsorted(edges, np.arange(size - 2), side='right') - 1
+    counts = np.bincount(bucket, minlength=buckets)
+    mean_x = np.bincount(bucket, x, minlength=buckets) / counts
+    mean_y = np.bincount(bucket, y, minlength=buckets) / counts
+
+    prev_x = np.concatenate([points[:1, 0], mean_x[:-1]])[bucket]
+    prev_y = np.concatenate([points[:1, 1], mean_y[:-1]])[bucket]
+    next_x = np.concatenate([mean_x[1:], points[-1:, 0]])[bucket]
+    next_y = np.concatenate([mean_y[1:], points[-1:, 1]])[bucket]
+    area = np.abs((prev_x - next_x) * (y - prev_y) - (prev_x - x) * (next_y - prev_y))
+
+    order = np.lexsort((-area, bucket))
+    chosen = order[np.concatenate([[0], np.cumsum(counts)[:-1]])]
+    return points[np.concatenate([[0], chosen + 1, [size - 1]])]
+
+
+def render_tokens_graph(title: str, xlabel: str, ylabel: str, series):
+    """Render price series to png bytes, runs inside a worker process.
+
+    series is a list of (label, [[timestamp_ms, price], ...]) tuples, prices may also be an
+    (n, 2) array. A fresh Figure is used per call so nothing is shared with pyplot's global
+    state or other renders."""
+    labels = {'family': 'serif', 'color': 'black', 'size': 15}
+    headings = {'family': 'serif', 'color': 'darkred', 'size': 20}
+
+    fig = Figure(figsize=GRAPH_FIGSIZE, dpi=GRAPH_DPI)
+    axes = fig.subplots()
+    axes.set_title(title, fontdict=headings)
+    axes.set_xlabel(xlabel, fontdict=labels)
+    axes.set_ylabel(ylabel, fontdict=labels)
+    axes.grid(axis='y')
+
+    for label, prices in series:
+        _df = pd.DataFrame(prices)
+        _df['dt'] = pd.to_datetime((_df[0] // 1000), unit='s')
+        _df['pr'] = round(_df[1], 2)
+        axes.plot(_df['dt'], _df['pr'], label=label)
+
+    axes.tick_params(axis='x', rotation=25)
+    axes.legend()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+INDICATOR_RE = re.compile(r'^(sma|ema|rsi|bb)(\d{0,3})$')
+INDICATOR_PERIODS = {'sma': 20, 'ema': 20, 'rsi': 14, 'bb': 20}
+
+
+def parse_indicator(text: str):
+    """'sma50' -> ('sma', 50), 'rsi' -> ('rsi', 14), anything unknown -> None"""
+    match = INDICATOR_RE.match(text.lower())
+    if not match:
+        return None
+    name, period = match.groups()
+    period = int(period) if period else INDICATOR_PERIODS[name]
+    return (name, period) if period > 1 else None
+
+
+def render_candles(title: str, ylabel: str, ohlc, indicators):
+    """Render a candlestick chart to png bytes, runs inside a worker process.
+
+    ohlc is a list of [timestamp_ms, open, high, low, close] rows, indicators a list of
+    (name, period) tuples from parse_indicator. Candles are drawn as one vlines and one bar
+    call and every indicator is a pandas rolling or ewm column, nothing loops per candle."""
+    labels = {'family': 'serif', 'color': 'black', 'size': 15}
+    headings = {'family': 'serif', 'color': 'darkred', 'size': 20}
+
+    _df = pd.DataFrame(ohlc, columns=['ts', 'open', 'high', 'low', 'close'])
+    x = mdates.date2num(pd.to_datetime(_df['ts'], unit='ms').to_numpy())
+    close = _df['close']
+    width = np.median(np.diff(x)) * 0.7 if len(x) > 1 else 0.5
+    colors = np.where(close >= _df['open'], 'tab:green', 'tab:red')
+
+    fig = Figure(figsize=GRAPH_FIGSIZE, dpi=GRAPH_DPI)
+    if any(name == 'rsi' for name, _ in indicators):
+        axes, rsi_axes = fig.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1]})
+        rsi_axes.axhline(70, color='grey', linestyle='--', linewidth=0.8)
+        rsi_axes.axhline(30, color='grey', linestyle='--', linewidth=0.8)
+        rsi_axes.set_ylim(0, 100)
+        rsi_axes.set_ylabel('RSI', fontdict=labels)
+    else:
+        axes = fig.subplots()
+        rsi_axes = None
+    axes.set_title(title, fontdict=headings)
+    axes.set_ylabel(ylabel, fontdict=labels)
+    axes.grid(axis='y')
+
+    axes.vlines(x, _df['low'], _df['high'], colors=colors, linewidth=1)
+    axes.bar(
+        x,
+        (close - _df['open']).abs().clip(lower=close.abs().max() * 1e-4),
+        width,
+        bottom=np.minimum(_df['open'], close),
+        color=colors,
+    )
+
+    for name, period in indicators:
+        match name:
+            case 'sma':
+                axes.plot(x, close.rolling(period).mean(), label=f'SMA {period}')
+            case 'ema':
+                axes.plot(x, close.ewm(span=period, adjust=False).mean(), label=f'EMA {period}')
+            case 'bb':
+                mean = close.rolling(period).mean()
+                std = close.rolling(period).std()
+                axes.plot(x, mean, label=f'BB {period}', color='tab:purple', linewidth=0.8)
+                axes.fill_between(x, mean - 2 * std, mean + 2 * std, color='tab:purple', alpha=0.1)
+            case 'rsi':
+                delta = close.diff()
+                gain = delta.clip(lower=0).ewm(alpha=1 / period, adjust=False).mean()
+                loss = (-delta.clip(upper=0)).ewm(alpha=1 / period, adjust=False).mean()
+                rsi_axes.plot(x, 100 - 100 / (1 + gain / loss), label=f'RSI {period}')
+
+    axes.xaxis_date()
+    (rsi_axes or axes).tick_params(axis='x', rotation=25)
+    if any(name != 'rsi' for name, _ in indicators):
+        axes.legend()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+class GraphCache:
+    """LRU cache of rendered chart pngs, capped by total size in bytes.
+
+    Entries expire at the next UTC midnight, when the daily closes they were drawn from
+    change, or after max_age seconds so the current price point doesn't get too old."""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_age: float = 900):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                self._evict(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, png: bytes):
+        if len(png) > self.max_bytes:
+            return
+        if key in self.entries:
+            self._evict(key)
+        now = time.time()
+        day = PriceSeriesStore.DAY_MS / 1000
+        expires = min((now // day + 1) * day, now + self.max_age)
+        self.entries[key] = (expires, png)
+        self.size += len(png)
+        while self.size > self.max_bytes:
+            self._evict(next(iter(self.entries)))
+
+    def _evict(self, key):
+        _, png = self.entries.pop(key)
+        self.size -= len(png)
+
+
+class ChartRenderer:
+    """Runs chart renders in a process pool.
+
+    At most `workers` charts render at once and at most `queue_size` more may wait for a
+    worker, anything beyond that is turned away so a burst of graph commands can't pile up."""
+
+    def __init__(self, workers: int = 2, queue_size: int = 8):
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.slots = asyncio.Semaphore(workers)
+        self.capacity = workers + queue_size
+        self.pending = 0
+
+    def try_reserve(self):
+        """claim a place in the queue up front, False when it is full.
+        Every successful reservation must be given back with release()"""
+        if self.pending >= self.capacity:
+            return False
+        self.pending += 1
+        return True
+
+    def release(self):
+        self.pending -= 1
+
+    async def render(self, func, *args):
+        """run func(*args) in the pool and return its result, the caller holds a reservation"""
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, func, *args)
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class PriceSeriesStore:
+    """Append-only on disk store of daily closes, one file per (token id, vs currency).
+
+    Each file is a flat array of little endian float64 (timestamp_ms, price) pairs sorted by
+    timestamp, read back through a memory map so a graph only pages in what it plots."""
+    DAY_MS = 86_400_000
+    DTYPE = np.dtype('<f8')
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.locks = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, token_id: str, currency: str):
+        return os.path.join(self.directory, f'{token_id}.{currency}.f8')
+
+    def lock(self, token_id: str, currency: str):
+        """lock serialising updates of one series"""
+        return self.locks.setdefault((token_id, currency), asyncio.Lock())
+
+    def read(self, token_id: str, currency: str):
+        """all stored (timestamp_ms, price) rows for a series"""
+        path = self.path(token_id, currency)
+        if not os.path.exists(path) or os.path.getsize(path) < 2 * self.DTYPE.itemsize:
+            return np.empty((0, 2), dtype=self.DTYPE)
+        return np.memmap(path, dtype=self.DTYPE, mode='r').reshape(-1, 2)
+
+    def append(self, token_id: str, currency: str, rows):
+        """add rows newer than everything already stored"""
+        with open(self.path(token_id, currency), 'ab') as series:
+            series.write(np.ascontiguousarray(rows, dtype=self.DTYPE).tobytes())
+
+    def complete(self, token_id: str, currency: str):
+        """True once a series is known to reach back to the token's first available day"""
+        return os.path.exists(f'{self.path(token_id, currency)}.start')
+
+    def mark_complete(self, token_id: str, currency: str):
+        """remember that the api has no history older than what the series holds"""
+        with open(f'{self.path(token_id, currency)}.start', 'wb'):
+            pass
+
+    def rewrite(self, token_id: str, currency: str, rows):
+        """replace a series, used when older history than we hold is fetched"""
+        path = self.path(token_id, currency)
+        with open(f'{path}.tmp', 'wb') as series:
+            series.write(np.ascontiguousarray(rows, dtype=self.DTYPE).tobytes())
+        os.replace(f'{path}.tmp', path)
+
+
+class CoingeckoClient:
+    """Rate limited access to the CoinGecko API.
+
+    Requests draw from a token bucket refilled at `rate` calls per minute. Waiting requests
+    are served in priority order and background work may not dip into the last `reserve`
+    tokens, so user commands keep working when we are close to the limit. A 429 empties
+    the bucket until its Retry-After has passed."""
+    USER = 0
+    BACKGROUND = 1
+
+    def __init__(self, client, api_base: str, rate: float = 30, burst: int = 10, reserve: int = 3):
+        self.client = client
+        self.api_base = api_base
+        self.rate = rate / 60
+        self.burst = burst
+        self.reserve = min(reserve, burst - 1)
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self.waiters = []
+        self.sequence = 0
+        self.wakeup = asyncio.Event()
+        self.dispatcher = None
+        self.throttled = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def _delay(self, priority: int):
+        """seconds until a request of this priority may go out"""
+        now = self._refill()
+        needed = 1 + (self.reserve if priority == self.BACKGROUND else 0)
+        return max(self.paused_until - now, (needed - self.tokens) / self.rate, 0)
+
+    async def acquire(self, priority: int = USER):
+        """wait for our turn and take a token from the bucket"""
+        if not self.waiters and self._delay(priority) == 0:
+            self.tokens -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, self.sequence, future))
+        self.sequence += 1
+        self.wakeup.set()
+        if self.dispatcher is None:
+            self.dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        while self.waiters:
+            priority, _, future = self.waiters[0]
+            if future.done():
+                heapq.heappop(self.waiters)
+                continue
+            delay = self._delay(priority)
+            if delay > 0:
+                # a more urgent request arriving wakes us up early
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self.waiters)
+            self.tokens -= 1
+            future.set_result(None)
+        self.dispatcher = None
+
+    def retry_after(self, header):
+        """back off after a 429, Retry-After is given in seconds"""
+        try:
+            seconds = float(header)
+        except (TypeError, ValueError):
+            seconds = 60
+        self.throttled += 1
+        self.tokens = 0
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    @asynccontextmanager
+    async def get(self, path: str, priority: int = USER, **kwargs):
+        """session.get against the api once the rate limit allows it"""
+        await self.acquire(priority)
+        async with self.client.session.get(f'{self.api_base}{path}', **kwargs) as response:
+            if response.status == 429:
+                self.retry_after(response.headers.get('Retry-After'))
+            yield response
+
+    def stats(self):
+        self._refill()
+        return {
+            'tokens': round(self.tokens, 1),
+            'waiting': len(self.waiters),
+            'throttled': self.throttled,
+        }
+
+
+def save_json(path: str, data):
+    """write data as json to path atomically, through a temporary file next to it"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as json_file:
+        json.dump(data, json_file)
+    os.replace(f'{path}.tmp', path)
+
+
+class AlertBook:
+    """Price alerts kept per (token id, vs currency) in lists sorted by threshold.
+
+    Given the previous and the new price of a token, the alerts that were crossed are a
+    contiguous slice of its list, so a poll costs two bisects per watched token no matter
+    how many alerts are registered. Alerts are one shot and persisted to a json file.
+
+    An alert added between polls is judged against the price seen when it was created
+    until the next poll, so an older polled price can't fire it straight away."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.alerts = {}
+        self.thresholds = {}
+        self.last_prices = {}
+        # alerts added since the last poll, {(token id, currency): {alert id: baseline price}}
+        self.fresh = {}
+        self.next_id = 1
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as alerts_file:
+            saved = json.load(alerts_file)
+        self.next_id = saved['next_id']
+        for alert in saved['alerts']:
+            self._index(alert)
+
+    def save(self):
+        save_json(self.path, {'next_id': self.next_id, 'alerts': list(self.alerts.values())})
+
+    def _index(self, alert):
+        self.alerts[alert['id']] = alert
+        insort(
+            self.thresholds.setdefault((alert['token'], alert['currency']), []),
+            (alert['threshold'], alert['id'])
+        )
+
+    def add(self, token_id: str, currency: str, threshold: float, user_id: int, channel_id: int,
+            baseline: float = None):
+        alert = {
+            'id': self.next_id,
+            'token': token_id,
+            'currency': currency,
+            'threshold': threshold,
+            'user': user_id,
+            'channel': channel_id,
+        }
+        self.next_id += 1
+        self._index(alert)
+        self.fresh.setdefault((token_id, currency), {})[alert['id']] = baseline
+        self.save()
+        return alert
+
+    def remove(self, alert_id: int):
+        alert = self.alerts.pop(alert_id)
+        key = (alert['token'], alert['currency'])
+        entries = self.thresholds[key]
+        del entries[bisect_left(entries, (alert['threshold'], alert_id))]
+        self.fresh.get(key, {}).pop(alert_id, None)
+        if not entries:
+            del self.thresholds[key]
+            self.last_prices.pop(key, None)
+            self.fresh.pop(key, None)
+        self.save()
+        return alert
+
+    def for_user(self, user_id: int):
+        return [alert for alert in self.alerts.values() if alert['user'] == user_id]
+
+    def watched(self):
+        """(token ids, currencies) that have at least one alert"""
+        return (
+            sorted({token for token, _ in self.thresholds}),
+            sorted({currency for _, currency in self.thresholds}),
+        )
+
+    @staticmethod
+    def crosses(threshold: float, previous: float, price: float):
+        """touching a threshold counts as crossing it in either direction"""
+        if price > previous:
+            return previous < threshold <= price
+        return price <= threshold < previous
+
+    def crossed(self, token_id: str, currency: str, price: float):
+        """record a new price and pop the alerts whose threshold lies between it and the
+        previous one"""
+        key = (token_id, currency)
+        entries = self.thresholds.get(key)
+        if not entries:
+            return []
+        previous = self.last_prices.get(key)
+        self.last_prices[key] = price
+        fresh = self.fresh.pop(key, {})
+        hit = {
+            alert_id for alert_id, baseline in fresh.items()
+            if baseline is not None and self.crosses(self.alerts[alert_id]['threshold'], baseline, price)
+        }
+        if previous is not None and previous != price:
+            # rising fires previous < threshold <= price, falling price <= threshold < previous
+            if price > previous:
+                start = bisect_right(entries, (previous, float('inf')))
+                stop = bisect_right(entries, (price, float('inf')))
+            else:
+                start = bisect_left(entries, (price, float('-inf')))
+                stop = bisect_left(entries, (previous, float('-inf')))
+            hit.update(alert_id for _, alert_id in entries[start:stop] if alert_id not in fresh)
+        if not hit:
+            return []
+        fired = [self.alerts.pop(alert_id) for _, alert_id in entries if alert_id in hit]
+        entries[:] = [entry for entry in entries if entry[1] not in hit]
+        if not entries:
+            del self.thresholds[key]
+            del self.last_prices[key]
+        return fired
+
+
+class PortfolioBook:
+    """Per user token holdings ({user id: {token id: amount}}) persisted to a json file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.holdings = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as portfolio_file:
+                self.holdings = {int(user): tokens for user, tokens in json.load(portfolio_file).items()}
+
+    def save(self):
+        save_json(self.path, self.holdings)
+
+    def set(self, user_id: int, token_id: str, amount: float):
+        """set a holding, an amount of 0 removes it"""
+        tokens = self.holdings.setdefault(user_id, {})
+        if amount:
+            tokens[token_id] = amount
+        else:
+            tokens.pop(token_id, None)
+            if not tokens:
+                del self.holdings[user_id]
+        self.save()
+
+    def frame(self, user_ids=None):
+        """holdings as a (user, token, amount) DataFrame, optionally for some users only"""
+        rows = [
+            (user_id, token_id, amount)
+            for user_id, tokens in self.holdings.items()
+            if user_ids is None or user_id in user_ids
+            for token_id, amount in tokens.items()
+        ]
+        return pd.DataFrame(rows, columns=['user', 'token', 'amount'])
+
+
+class ExchangeRates:
+    """Rates of every currency coingecko publishes in /exchange_rates, as one vector of
+    units per USD, so a USD price converts to any or all currencies with one multiply."""
+
+    def __init__(self, rates=None):
+        rates = rates or {}
+        usd = rates.get('usd', {}).get('value')
+        self.currencies = tuple(rates) if usd else ()
+        self.position = {currency: i for i, currency in enumerate(self.currencies)}
+        self.per_usd = np.array(
+            [rates[currency]['value'] / usd for currency in self.currencies], dtype=float
+        )
+        self.updated = time.time()
+
+    def __contains__(self, currency):
+        return currency in self.position
+
+    def convert(self, usd_amount, currency: str):
+        return usd_amount * self.per_usd[self.position[currency]]
+
+    def table(self, usd_amount, currencies):
+        """{currency: value} for the requested currencies we have rates for"""
+        wanted = [currency for currency in currencies if currency in self.position]
+        values = usd_amount * self.per_usd[[self.position[currency] for currency in wanted]]
+        return dict(zip(wanted, values.tolist()))
+
+
+class TickerBook:
+    """Live ticker messages, {channel id: {'message', 'tokens', 'currency'}} persisted to a
+    json file. The last rendered text per channel is kept in memory only."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tickers = {}
+        self.rendered = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as tickers_file:
+                self.tickers = {int(channel): ticker for channel, ticker in json.load(tickers_file).items()}
+
+    def save(self):
+        save_json(self.path, self.tickers)
+
+    def set(self, channel_id: int, message_id: int, token_ids, currency: str):
+        self.tickers[channel_id] = {'message': message_id, 'tokens': token_ids, 'currency': currency}
+        self.rendered.pop(channel_id, None)
+        self.save()
+
+    def remove(self, channel_id: int):
+        ticker = self.tickers.pop(channel_id, None)
+        self.rendered.pop(channel_id, None)
+        self.save()
+        return ticker
+
+
+class CoingeckoError(Exception):
+    """An upstream request failed, the message is safe to show to users"""
+
+
+def currency_fields(prices: dict, currency: str):
+    """the fields of one /simple/price entry that belong to currency"""
+    prefix = f'{currency}_'
+    return {
+        field: value for field, value in prices.items()
+        if field == currency or field.startswith(prefix)
+    }
+
+
+class UsageTracker:
+    """Exponentially decaying hit counters, a count halves every half_life seconds"""
+
+    def __init__(self, half_life: float = 600):
+        self.half_life = half_life
+        self.scores = {}
+
+    def _decayed(self, key, now):
+        score, updated = self.scores.get(key, (0, now))
+        return score * 0.5 ** ((now - updated) / self.half_life)
+
+    def record(self, key):
+        now = time.monotonic()
+        self.scores[key] = (self._decayed(key, now) + 1, now)
+
+    def top(self, count: int, minimum: float = 1):
+        """the count most used keys still scoring at least minimum, forgets the rest"""
+        now = time.monotonic()
+        current = {key: self._decayed(key, now) for key in self.scores}
+        for key, score in current.items():
+            if score < minimum:
+                del self.scores[key]
+        return heapq.nlargest(count, (key for key in self.scores), key=current.get)
+
+
+class PriceBatcher:
+    """Merges price lookups arriving within a short window into one /simple/price call.
+
+    Every command in every guild and shard goes through the same batcher, so a burst of
+    `coin price` commands costs one request per window instead of one per command."""
+
+    def __init__(self, fetch, window: float = 0.05, max_ids: int = 250):
+        # fetch(token_ids, currencies) -> raw /simple/price payload
+        self.fetch = fetch
+        self.window = window
+        self.max_ids = max_ids
+        self.batch = None
+        self.flushes = set()
+
+    async def get(self, token_ids, currency: str):
+        """prices for token_ids in currency, gathered with whatever else arrives this window"""
+        if self.batch is None:
+            loop = asyncio.get_running_loop()
+            self.batch = (set(), set(), loop.create_future())
+            loop.call_later(self.window, self._flush)
+        ids, currencies, future = self.batch
+        ids.update(token_ids)
+        currencies.add(currency)
+
+        # shielded so one cancelled command doesn't cancel the lookup for everyone else
+        data = await asyncio.shield(future)
+        return {
+            token_id: currency_fields(data[token_id], currency)
+            for token_id in token_ids if token_id in data
+        }
+
+    def _flush(self):
+        ids, currencies, future = self.batch
+        self.batch = None
+        task = asyncio.create_task(self._run(sorted(ids), sorted(currencies), future))
+        self.flushes.add(task)
+        task.add_done_callback(self.flushes.discard)
+
+    async def _run(self, ids, currencies, future):
+        # mark the exception as retrieved in case every waiter was cancelled
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            results = await asyncio.gather(*(
+                self.fetch(ids[i:i + self.max_ids], currencies)
+                for i in range(0, len(ids), self.max_ids)
+            ))
+        except Exception as e:  # pylint: disable=W0703
+            future.set_exception(e)
+            return
+        merged = {}
+        for result in results:
+            merged.update(result)
+        future.set_result(merged)
+
+
+class PriceCache:
+    """Short lived cache of /simple/price results keyed on (token id, vs currency), also
+    used for /coins/markets pages keyed on (page, vs currency).
+
+    Concurrent misses for the same key share one upstream request: the first caller
+    fetches and everyone else arriving before it finishes awaits the same future."""
+
+    def __init__(self, fetch, ttl: float = 30, max_entries: int = 2048):
+        # fetch(token_ids, currency) -> {token_id: {field: value}}
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.usage = UsageTracker()
+
+    async def get_many(self, token_ids, currency: str):
+        """prices for each token in currency, tokens the API doesn't know map to None"""
+        now = time.monotonic()
+        found = {}
+        waiting = {}
+        missing = []
+        for token_id in dict.fromkeys(token_ids):
+            key = (token_id, currency)
+            self.usage.record(key)
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                found[token_id] = entry[1]
+            elif key in self.inflight:
+                self.coalesced += 1
+                waiting[token_id] = self.inflight[key]
+            else:
+                self.misses += 1
+                missing.append(token_id)
+
+        if missing:
+            waiting.update(await self._fetch_missing(missing, currency))
+        for token_id, future in waiting.items():
+            found[token_id] = await future
+        return found
+
+    async def _fetch_missing(self, token_ids, currency: str):
+        loop = asyncio.get_running_loop()
+        futures = {token_id: loop.create_future() for token_id in token_ids}
+        for token_id, future in futures.items():
+            # mark failures as retrieved, get_many stops awaiting at the first one that raises
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self.inflight[(token_id, currency)] = future
+        try:
+            data = await self.fetch(token_ids, currency)
+        except asyncio.CancelledError:
+            # the fetching caller went away, don't leave coalesced callers waiting forever
+            for future in futures.values():
+                future.set_exception(CoingeckoError('Price request was cancelled, please try again.'))
+            raise
+        except Exception as e:  # pylint: disable=W0703
+            for future in futures.values():
+                future.set_exception(e)
+        else:
+            expires = time.monotonic() + self.ttl
+            if len(self.entries) > self.max_entries:
+                self.prune()
+            for token_id, future in futures.items():
+                prices = data.get(token_id)
+                if prices is not None:
+                    self.entries[(token_id, currency)] = (expires, prices)
+                future.set_result(prices)
+        finally:
+            for token_id in token_ids:
+                self.inflight.pop((token_id, currency), None)
+        return futures
+
+    def prime(self, data: dict, keys):
+        """store a raw multi currency /simple/price payload for the given keys"""
+        expires = time.monotonic() + self.ttl
+        for token_id, currency in keys:
+            if token_id in data:
+                self.entries[(token_id, currency)] = (expires, currency_fields(data[token_id], currency))
+
+    def prune(self):
+        """drop expired entries"""
+        now = time.monotonic()
+        self.entries = {key: entry for key, entry in self.entries.items() if entry[0] > now}
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'entries': len(self.entries),
+            'hot': len(self.usage.scores),
+        }
 
 
 class Coingecko(commands.Cog, name='Coin'):
@@ -26,18 +973,77 @@ class Coingecko(commands.Cog, name='Coin'):
     Docs: https://www.coingecko.com/en/api/documentation"""
     API_URL_BASE = 'https://api.coingecko.com/api/v3'
     CG_ICON = 'https://cdn.discordapp.com/attachments/788621973709127693/988362901213548604/cg.webp'
+    # catalog refresh interval in minutes, doubled every time a refresh finds nothing new
+    CATALOG_MIN_INTERVAL = 1
+    CATALOG_MAX_INTERVAL = 32
 
     def __init__(self, client, currency='usd', api_base=API_URL_BASE, cg_icon=CG_ICON):
         self.client = client
         self.currency = currency
         self.api_base = api_base
         self.cg_icon = cg_icon
-        self.currencies = []
-        self.tokens = []
+        self.api = CoingeckoClient(
+            client,
+            api_base,
+            rate=client.config.get('coingecko_rate_limit', 30),
+            burst=client.config.get('coingecko_burst', 10),
+            reserve=client.config.get('coingecko_user_reserve', 3),
+        )
+        self.index = TokenIndex()
+        # per catalog path: (etag, body digest) of the last payload we applied
+        self.catalog_versions = {}
+        self.graphs = GraphCache(
+            max_bytes=client.config.get('coingecko_graph_cache_bytes', 32 * 1024 * 1024),
+            max_age=client.config.get('coingecko_graph_max_age', 900),
+        )
+        self.renderer = ChartRenderer(
+            workers=client.config.get('coingecko_render_workers', 2),
+            queue_size=client.config.get('coingecko_render_queue', 8),
+        )
+        self.batcher = PriceBatcher(
+            self.fetch_prices,
+            window=client.config.get('coingecko_batch_window', 0.05),
+        )
+        self.prices = PriceCache(
+            self.batcher.get,
+            ttl=client.config.get('coingecko_price_ttl', 30),
+        )
+        self.series = PriceSeriesStore(
+            client.config.get('coingecko_series_dir', '../data/series')
+        )
+        self.markets = PriceCache(
+            self.fetch_market_pages,
+            ttl=client.config.get('coingecko_markets_ttl', 60),
+        )
+        self.market_fetches = asyncio.Semaphore(client.config.get('coingecko_market_fetches', 3))
+        # bounds the market_chart requests a single graph fires at once
+        self.chart_fetches = asyncio.Semaphore(client.config.get('coingecko_chart_fetches', 4))
         self.base_url = 'https://www.coingecko.com/'
+        self.rates = ExchangeRates()
+        self.portfolios = PortfolioBook(
+            client.config.get('coingecko_portfolios_file', '../data/portfolios.json')
+        )
+        self.tickers = TickerBook(client.config.get('coingecko_tickers_file', '../data/tickers.json'))
+        self.alerts = AlertBook(client.config.get('coingecko_alerts_file', '../data/alerts.json'))
+        self.alert_queue = asyncio.Queue(maxsize=client.config.get('coingecko_alert_queue', 500))
+        self.alert_sender = None
 
         self.supported_currencies.start()  # pylint: disable=E1101
         self.supported_tokens.start()  # pylint: disable=E1101
+        self.market_ranks.start()  # pylint: disable=E1101
+        self.exchange_rates.start()  # pylint: disable=E1101
+        self.prefetch_prices.change_interval(  # pylint: disable=E1101
+            seconds=client.config.get('coingecko_prefetch_interval', 20)
+        )
+        self.prefetch_prices.start()  # pylint: disable=E1101
+        self.live_tickers.change_interval(  # pylint: disable=E1101
+            seconds=client.config.get('coingecko_ticker_interval', 60)
+        )
+        self.live_tickers.start()  # pylint: disable=E1101
+        self.price_alerts.change_interval(  # pylint: disable=E1101
+            seconds=client.config.get('coingecko_alert_interval', 60)
+        )
+        self.price_alerts.start()  # pylint: disable=E1101
 
     def get_embed(self, **kwargs):
         """generate an embed using a standard branding template"""
@@ -49,26 +1055,103 @@ class Coingecko(commands.Cog, name='Coin'):
         )
         return embed
 
-    @tasks.loop(minutes=1)
+    async def cog_unload(self):
+        self.supported_currencies.cancel()  # pylint: disable=E1101
+        self.supported_tokens.cancel()  # pylint: disable=E1101
+        self.market_ranks.cancel()  # pylint: disable=E1101
+        self.exchange_rates.cancel()  # pylint: disable=E1101
+        self.prefetch_prices.cancel()  # pylint: disable=E1101
+        self.live_tickers.cancel()  # pylint: disable=E1101
+        self.price_alerts.cancel()  # pylint: disable=E1101
+        if self.alert_sender:
+            self.alert_sender.cancel()
+        self.renderer.close()
+
+    @tasks.loop(minutes=CATALOG_MIN_INTERVAL)
     async def supported_currencies(self):
         """list of all supported currencies - list"""
-        async with self.client.session.get(
-            f'{self.api_base}/simple/supported_vs_currencies'
-        ) as response:
-            _currencies = await self.get_data_safely(ctx=None, response=response)
-            if _currencies:
-                # only update our list of currencies if we actually got them
-                self.currencies = _currencies
+        _currencies = await self.get_catalog_safely('/simple/supported_vs_currencies')
+        if _currencies is None:
+            self.backoff_catalog(self.supported_currencies)
+        elif _currencies and self.index.currencies != {c.lower() for c in _currencies}:
+            # only update our list of currencies if we actually got them
+            self.index = self.index.with_currencies(_currencies)
+            self.reset_catalog(self.supported_currencies)
 
-    @tasks.loop(minutes=1)
+    @tasks.loop(minutes=CATALOG_MIN_INTERVAL)
     async def supported_tokens(self):
         """generate a list of supported tokens"""
-        async with self.client.session.get(f'{self.api_base}/coins/list') as response:
-            _tokens = await self.get_data_safely(ctx=None, response=response)
-            if _tokens:
-                # only update our list of tokens if we actually got them
-                self.tokens = [(token['id'], token['symbol'])
-                               for token in _tokens]
+        _tokens = await self.get_catalog_safely('/coins/list', fields=('id', 'symbol'))
+        if _tokens is None:
+            self.backoff_catalog(self.supported_tokens)
+        elif _tokens:
+            # only update our list of tokens if we actually got them
+            added, removed = self.index.diff(dict(_tokens))
+            if added or removed:
+                self.index = self.index.apply(added, removed)
+                self.reset_catalog(self.supported_tokens)
+
+    @tasks.loop(minutes=30)
+    async def market_ranks(self):
+        """snapshot of market cap ranks used to pick between tokens sharing a symbol"""
+        ranks = {}
+        for page in range(1, self.client.config.get('coingecko_rank_pages', 4) + 1):
+            async with self.api.get(
+                f'/coins/markets?vs_currency=usd&order=market_cap_desc&per_page=250&page={page}',
+                CoingeckoClient.BACKGROUND
+            ) as response:
+                if response.status != 200:
+                    await self.get_data_safely(ctx=None, response=response)
+                    return
+                markets = decode_json(await response.read(), ('id', 'market_cap_rank'), many=True)
+            ranks.update((token_id, rank) for token_id, rank in markets if rank)
+            if len(markets) < 250:
+                break
+        if ranks and ranks != self.index.ranks:
+            self.index = self.index.with_ranks(ranks)
+
+    @tasks.loop(minutes=5)
+    async def exchange_rates(self):
+        """BTC based exchange rates for every currency, used to convert USD prices locally"""
+        async with self.api.get('/exchange_rates', CoingeckoClient.BACKGROUND) as response:
+            if response.status != 200:
+                await self.get_data_safely(ctx=None, response=response)
+                return
+            rates = decode_json(await response.read(), ('rates',))['rates']
+        if rates:
+            self.rates = ExchangeRates(rates)
+
+    async def get_catalog_safely(self, path, fields=None):
+        """Fetch a rarely changing catalog, returns None when it is unchanged since the last
+        successful fetch, [] on an API error and the decoded payload otherwise.
+        fields projects a list of objects down to tuples of just those fields"""
+        etag, digest = self.catalog_versions.get(path, (None, None))
+        headers = {'If-None-Match': etag} if etag else {}
+        async with self.api.get(path, CoingeckoClient.BACKGROUND, headers=headers) as response:
+            if response.status == 304:
+                return None
+            if response.status != 200:
+                await self.get_data_safely(ctx=None, response=response)
+                return []
+            body = await response.read()
+            new_digest = hashlib.blake2b(body, digest_size=16).digest()
+            self.catalog_versions[path] = (response.headers.get('ETag'), new_digest)
+            if new_digest == digest:
+                return None
+            return decode_json(body, fields, many=fields is not None)
+
+    @staticmethod
+    def backoff_catalog(loop):
+        """nothing changed upstream, poll a catalog less often"""
+        minutes = min(loop.minutes * 2, Coingecko.CATALOG_MAX_INTERVAL)
+        if minutes != loop.minutes:
+            loop.change_interval(minutes=minutes)
+
+    @staticmethod
+    def reset_catalog(loop):
+        """a catalog changed upstream, go back to polling it every minute"""
+        if loop.minutes != Coingecko.CATALOG_MIN_INTERVAL:
+            loop.change_interval(minutes=Coingecko.CATALOG_MIN_INTERVAL)
 
     # ----------------------------------------------
     # helper functions...
@@ -76,51 +1159,236 @@ class Coingecko(commands.Cog, name='Coin'):
 
     def get_token(self, token_partial_name_or_symbol: str):
         """fetch a token by name or symbol and return the id"""
-        _token_id = None
-        for (token_id, token_symbol) in self.tokens:
-            if token_partial_name_or_symbol.lower() in (token_id.lower(), token_symbol.lower()):
-                _token_id = token_id
-                break
-        return _token_id
+        return self.index.get(token_partial_name_or_symbol)
 
-    async def create_tokens_graph(self, ctx, num_days: int, vs_currency: str, *tokens):
-        """create a plot graph from a bunch of given tokens over a number of days"""
-        labels = {'family': 'serif', 'color': 'black', 'size': 15}
-        headings = {'family': 'serif', 'color': 'darkred', 'size': 20}
+    async def fetch_prices(self, token_ids, currencies, priority=CoingeckoClient.USER):
+        """/simple/price for lists of token ids and currencies with market data included"""
+        async with self.api.get(
+            f'/simple/price?ids={",".join(token_ids)}'
+            f'&vs_currencies={",".join(currencies)}'
+            '&include_market_cap=true&include_24hr_vol=true&include_24hr_change=true',
+            priority
+        ) as response:
+            data = await self.get_data_safely(ctx=None, response=response)
+            if data is None:
+                raise CoingeckoError(
+                    f'Unable to process response from CoinGecko API\n{response.status} - {response.reason}'
+                )
+            return data
 
-        if len(tokens) == 1:
-            plt.title(self.get_token(tokens[0]).title(), fontdict=headings)
-        else:
-            plt.title('Multiple Tokens', fontdict=headings)
+    MARKETS_PAGE_SIZE = 50
+
+    async def fetch_market_page(self, page: int, currency: str):
+        """one page of /coins/markets projected to the columns of the markets table"""
+        async with self.market_fetches:
+            async with self.api.get(
+                f'/coins/markets?vs_currency={currency}&order=market_cap_desc'
+                f'&per_page={self.MARKETS_PAGE_SIZE}&page={page}'
+            ) as response:
+                if response.status != 200:
+                    await self.get_data_safely(ctx=None, response=response)
+                    raise CoingeckoError(
+                        f'Unable to process response from CoinGecko API\n{response.status} - {response.reason}'
+                    )
+                return decode_json(
+                    await response.read(),
+                    ('market_cap_rank', 'symbol', 'current_price',
+                     'price_change_percentage_24h', 'market_cap'),
+                    many=True
+                )
 
-        plt.figure(figsize=[12.8, 9.6])
-        plt.xlabel(f'Last {num_days} Days', fontdict=labels)
-        plt.ylabel(f'Price {vs_currency.upper()}', fontdict=labels)
-        plt.grid(axis='y')
+    async def fetch_market_pages(self, pages, currency: str):
+        """fetch /coins/markets pages concurrently, returns {page: rows}"""
+        results = await asyncio.gather(*(self.fetch_market_page(page, currency) for page in pages))
+        return dict(zip(pages, results))
 
-        for token in tokens:
-            ticker = token.upper()
-            token = self.get_token(token)
+    async def fetch_market_chart(self, token: str, vs_currency: str, num_days: int):
+        """fetch the daily price history for a token, returns (prices, error)"""
+        async with self.chart_fetches:
+            try:
+                async with self.api.get(
+                    f'/coins/{token}/market_chart?vs_currency={vs_currency}' +
+                    f'&days={num_days}&interval=daily'
+                ) as response:
+                    if response.status != 200:
+                        return None, f'{response.status} - {response.reason}'
+                    data = decode_json(await response.read(), ('prices',))
+            except (ClientError, asyncio.TimeoutError) as e:
+                return None, type(e).__name__
+        if not data.get('prices'):
+            return None, 'no price data'
+        return data['prices'], None
+
+    async def price_history(self, token: str, vs_currency: str, num_days: int):
+        """daily closes for the last num_days plus the current price, returns (prices, error)
 
-            async with self.client.session.get(
-                f'{self.api_base}/coins/{token}/market_chart?vs_currency={vs_currency}' +
-                f'&days={num_days}&interval=daily'
+        Closes come from the local series store, only days it doesn't hold yet are fetched
+        and the current price is taken from the price cache."""
+        day = PriceSeriesStore.DAY_MS
+        today = int(time.time() * 1000) // day * day
+        start = today - num_days * day
+        live = None
+
+        async with self.series.lock(token, vs_currency):
+            history = self.series.read(token, vs_currency)
+            # a token listed after start can't have more history than the series already holds
+            covered = len(history) > 0 and (
+                history[0, 0] <= start or self.series.complete(token, vs_currency)
+            )
+            if not covered:
+                fetch_days = num_days
+            elif history[-1, 0] < today:
+                fetch_days = int(today - history[-1, 0]) // day + 1
+            else:
+                fetch_days = 0
+
+            if fetch_days:
+                prices, error = await self.fetch_market_chart(token, vs_currency, fetch_days)
+                if error:
+                    return None, error
+                prices = np.asarray(prices, dtype=PriceSeriesStore.DTYPE)
+                live = prices[-1]
+                # the last point is the current price, the rest are daily closes
+                closes = prices[:-1].copy()
+                closes[:, 0] = closes[:, 0] // day * day
+                closes = closes[closes[:, 0] <= today]
+                if covered:
+                    self.series.append(token, vs_currency, closes[closes[:, 0] > history[-1, 0]])
+                else:
+                    # newest rows win when the same day shows up twice
+                    rows = np.concatenate([history, closes])[::-1]
+                    _, latest = np.unique(rows[:, 0], return_index=True)
+                    self.series.rewrite(token, vs_currency, rows[latest])
+                    if len(closes) and closes[0, 0] > start + day:
+                        # the api returned less than asked for, that's all there is
+                        self.series.mark_complete(token, vs_currency)
+                history = self.series.read(token, vs_currency)
+
+        window = np.array(history[history[:, 0] >= start])
+        if live is None:
+            try:
+                current = (await self.prices.get_many([token], vs_currency)).get(token)
+            except CoingeckoError:
+                current = None
+            if current and vs_currency in current:
+                live = (time.time() * 1000, current[vs_currency])
+        if live is not None:
+            window = np.vstack([window, live])
+        if len(window) == 0:
+            return None, 'no price data'
+        return window, None
+
+    async def fetch_ohlc(self, token: str, vs_currency: str, num_days: int):
+        """fetch candles for a token, returns (ohlc rows, error)"""
+        try:
+            async with self.api.get(
+                f'/coins/{token}/ohlc?vs_currency={vs_currency}&days={num_days}'
             ) as response:
-                data = await self.get_data_safely(ctx, response)
-                if not data:
-                    # return because there might have been an error with the API
-                    return
-            _df = pd.DataFrame(data['prices'])
-            _df['dt'] = pd.to_datetime((_df[0] // 1000), unit='s')
-            _df['pr'] = round(_df[1], 2)
+                if response.status != 200:
+                    return None, f'{response.status} - {response.reason}'
+                data = decode_json(await response.read())
+        except (ClientError, asyncio.TimeoutError) as e:
+            return None, type(e).__name__
+        if not data:
+            return None, 'no price data'
+        return data, None
 
-            plt.plot(_df['dt'], _df['pr'], label=f'{ticker} - {token.title()}')
-            plt.tick_params(axis='x', rotation=25)
-            plt.legend()
+    async def value_holdings(self, holdings, currency: str):
+        """price a (user, token, amount) frame with one batched lookup and add value columns"""
+        prices = await self.prices.get_many(holdings['token'].unique().tolist(), currency)
+        quotes = pd.DataFrame.from_dict(
+            {token: quote for token, quote in prices.items() if quote}, orient='index'
+        ).reindex(columns=[currency, f'{currency}_24h_change'])
+        holdings = holdings.assign(
+            price=holdings['token'].map(quotes[currency]),
+            change=holdings['token'].map(quotes[f'{currency}_24h_change']),
+        )
+        holdings['value'] = holdings['amount'] * holdings['price']
+        # what the same holding was worth 24h ago, tokens without a 24h change count as flat
+        holdings['value_24h'] = holdings['value'] / (1 + holdings['change'].fillna(0) / 100)
+        return holdings
 
-        plt.savefig('tokens_graph.png')
-        plt.cla()
-        return True
+    def ticker_embed(self, ticker, data):
+        """the embed shown by a live ticker, None when we have no price for any of its tokens"""
+        currency = ticker['currency']
+        lines = []
+        for token_id in ticker['tokens']:
+            prices = data.get(token_id) or {}
+            if currency not in prices:
+                continue
+            change = prices.get(f'{currency}_24h_change') or 0
+            arrow = '▲' if change >= 0 else '▼'
+            lines.append(
+                f'{self.index.tokens.get(token_id, token_id).upper()[:8]:<8} '
+                f'{prices[currency]:>16,.8g} {arrow} {change:>6.2f}%'
+            )
+        if not lines:
+            return None
+        return self.get_embed(
+            color=0xFFFF00,
+            title=f'Live Prices ({currency.upper()})',
+            description='```' + '\n'.join(lines) + '```'
+        )
+
+    async def create_tokens_graph(self, ctx, num_days: int, vs_currency: str, *tokens):
+        """create a plot graph from a bunch of given tokens over a number of days,
+        returns the png bytes"""
+        vs_currency = vs_currency.lower()
+        token_ids = sorted({self.get_token(token) for token in tokens})
+        key = (num_days, vs_currency, tuple(token_ids))
+        png = self.graphs.get(key)
+        if png:
+            return png
+
+        if not self.renderer.try_reserve():
+            await ctx.send(embed=self.get_embed(
+                color=0xFF0000,
+                title='Too many graphs requested',
+                description='Chirpy is busy drawing other graphs, please try again shortly'
+            ))
+            return
+
+        try:
+            results = await asyncio.gather(*(
+                self.price_history(token, vs_currency, num_days) for token in token_ids
+            ))
+
+            series = []
+            failed = []
+            for token, (prices, error) in zip(token_ids, results):
+                ticker = self.index.tokens.get(token, token).upper()
+                if error:
+                    failed.append(f'{ticker} ({token}): {error}')
+                else:
+                    series.append((f'{ticker} - {token.title()}', downsample(prices)))
+
+            if failed:
+                await ctx.send(embed=self.get_embed(
+                    color=0xFF0000,
+                    title='API error while fetching data',
+                    description='Unable to fetch price history from CoinGecko API for:\n'
+                                + '\n'.join(failed)
+                ))
+            if not series:
+                return
+
+            if len(token_ids) == 1:
+                title = token_ids[0].title()
+            else:
+                title = 'Multiple Tokens'
+
+            png = await self.renderer.render(
+                render_tokens_graph,
+                title,
+                f'Last {num_days} Days',
+                f'Price {vs_currency.upper()}',
+                series,
+            )
+            if not failed:
+                self.graphs.put(key, png)
+            return png
+        finally:
+            self.renderer.release()
 
     # ----------------------------------------------
     # coingecko simple api cog commands
@@ -144,7 +1412,7 @@ class Coingecko(commands.Cog, name='Coin'):
     async def coingecko_ping(self, ctx):
         """ping the coingecko server to check the latency"""
         start = dt.utcnow()
-        async with self.client.session.get(f'{self.api_base}/ping') as response:
+        async with self.api.get('/ping') as response:
             data = await self.get_data_safely(ctx, response)
             stop = dt.utcnow()
             if not data:
@@ -159,6 +1427,31 @@ class Coingecko(commands.Cog, name='Coin'):
                 color=0xFFFF00
             ))
 
+    @coin.command(
+        name='cache',
+        hidden=True
+    )
+    async def coingecko_cache(self, ctx):
+        """show how well the price cache is doing"""
+        stats = self.prices.stats()
+        stats['market pages'] = len(self.markets.entries)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        hit_rate = (stats['hits'] + stats['coalesced']) / lookups * 100 if lookups else 0
+        embed = self.get_embed(title='Price Cache', color=0xFFFF00)
+        for name, value in stats.items():
+            embed.add_field(name=name.title(), value=f'{value:,}', inline=True)
+        embed.add_field(name='Hit Rate', value=f'{hit_rate:.1f}%', inline=True)
+        embed.add_field(name='TTL', value=f'{self.prices.ttl}s', inline=True)
+        embed.add_field(
+            name='Graphs',
+            value=f'{len(self.graphs.entries)} cached, {self.graphs.size / 1024:,.0f} KiB\n'
+                  f'{self.graphs.hits:,} hits / {self.graphs.misses:,} misses',
+            inline=True
+        )
+        for name, value in self.api.stats().items():
+            embed.add_field(name=f'API {name.title()}', value=value, inline=True)
+        await ctx.send(embed=embed)
+
     @coin.command(
         name='price',
         aliases=['$']
@@ -166,60 +1459,66 @@ class Coingecko(commands.Cog, name='Coin'):
     async def token_price(self, ctx, *token):
         """Current price for {token} or {token1} {token2} {token3}"""
 
-        if not self.tokens:
+        if not self.index.tokens:
             return await ctx.send(embed=self.get_embed(
                 color=0xFF0000,
                 title='API error while fetching data',
                 description='Unable to fetch tokens from API, please try again later'
             ))
-        tokens = ','.join((str(self.get_token(x)) for x in token))
+        tokens = [token_id for token_id in map(self.get_token, token) if token_id]
 
-        async with self.client.session.get(
-            f'{self.api_base}/simple/price?ids={tokens}&vs_currencies={self.currency}'
-            '&include_market_cap=true&include_24hr_vol=true&include_24hr_change=true'
-        ) as response:
-            data = await self.get_data_safely(ctx, response)
-            if not data:
-                # return because there might have been an error with the API
-                return
-            for token, prices in data.items():
-                embed = self.get_embed(
-                    title=f'{token.title()} Price',
-                    url=f'{self.base_url}en/coins/{token}',
-                    color=0xFFFF00
-                )
-                for desc, value in prices.items():
-                    match desc:
-                        case 'usd':
-                            value = round(value, 2)
-                            embed.add_field(
-                                name='Price (USD)',
-                                value=f'${value:,}',
-                                inline=True
-                            )
-                        case 'usd_market_cap':
-                            value = int(round(value, 0))
-                            embed.add_field(
-                                name='Market Cap (USD)',
-                                value=f'{value:,}',
-                                inline=True
-                            )
-                        case 'usd_24h_vol':
-                            value = int(round(value, 0))
-                            embed.add_field(
-                                name='24hr Volume (USD)',
-                                value=f'{value:,}',
-                                inline=True
-                            )
-                        case 'usd_24h_change':
-                            value = round(value, 2)
-                            embed.add_field(
-                                name='24hr Change (USD)',
-                                value=f'{value:,}%',
-                                inline=True
-                            )
-                await ctx.send(embed=embed)
-                await asyncio.sleep(1)
+        try:
+            data = await self.prices.get_many(tokens, self.currency)
+        except CoingeckoError as e:
+            return await ctx.send(embed=self.get_embed(
+                title='API error while fetching data',
+                description=f'{e}, please try again later',
+                color=0xFF0000
+            ))
+        embeds = []
+        for token, prices in data.items():
+            if prices is None:
+                continue
+            embed = self.get_embed(
+                title=f'{token.title()} Price',
+                url=f'{self.base_url}en/coins/{token}',
+                color=0xFFFF00
+            )
+            for desc, value in prices.items():
+                match desc:
+                    case 'usd':
+                        value = round(value, 2)
+                        embed.add_field(
+                            name='Price (USD)',
+                            value=f'${value:,}',
+                            inline=True
+                        )
+                    case 'usd_market_cap':
+                        value = int(round(value, 0))
+                        embed.add_field(
+                            name='Market Cap (USD)',
+                            value=f'{value:,}',
+                            inline=True
+                        )
+                    case 'usd_24h_vol':
+                        value = int(round(value, 0))
+                        embed.add_field(
+                            name='24hr Volume (USD)',
+                            value=f'{value:,}',
+                            inline=True
+                        )
+                    case 'usd_24h_change':
+                        value = round(value, 2)
+                        embed.add_field(
+                            name='24hr Change (USD)',
+                            value=f'{value:,}%',
+                            inline=True
+                        )
+            embeds.append(embed)
+
+        # discord allows up to 10 embeds per message
+        for i in range(0, len(embeds), 10):
+            await ctx.send(embeds=embeds[i:i + 10])
 
     @coin.command(
         name='value',
@@ -227,13 +1526,13 @@ class Coingecko(commands.Cog, name='Coin'):
     )
     async def token_amount(self, ctx, token: str, currency: str, amt: float = None):
         """Current value for X amount of tokens. {token} {currency} {amount}"""
-        if not self.tokens:
+        if not self.index.tokens:
             return await ctx.send(embed=self.get_embed(
                 color=0xFF0000,
                 title='API error while fetching data',
                 description='Unable to fetch tokens from API, please try again later'
             ))
-        if not self.currencies:
+        if not self.index.currencies:
             return await ctx.send(embed=self.get_embed(
                 color=0xFF0000,
                 title='API error while fetching data',
@@ -249,43 +1548,71 @@ class Coingecko(commands.Cog, name='Coin'):
                 description=f'Token: `{token_err}` invalid or not found!'
             ))
 
-        async with self.client.session.get(
-            f'{self.api_base}/simple/price?ids={token}&vs_currencies={currency}'
-        ) as response:
-            data = await self.get_data_safely(ctx, response)
-            if not data:
-                return
+        currency = currency.lower()
+        if currency not in self.index.currencies:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFF0000,
+                title='User input error',
+                description=f'{currency.upper()} not found, supported currencies:\n'
+                f'```{", ".join(sorted(self.index.currencies))}```'
+            ))
 
-            if currency not in self.currencies:
-                return await ctx.send(embed=self.get_embed(
-                    color=0xFF0000,
-                    title='User input error',
-                    description=f'{currency.upper()} not found, supported currencies:\n'
-                    f'```{", ".join(self.currencies)}```'
-                ))
+        if not amt:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFFFF00,
+                title='User input error',
+                description=f'Amount `{amt}` not a valid amount.'
+            ))
 
-            if not amt:
-                return await ctx.send(embed=self.get_embed(
-                    color=0xFFFF00,
-                    title='User input error',
-                    description=f'Amount `{amt}` not a valid amount.'
-                ))
+        # one cached USD price covers every currency we have an exchange rate for
+        quote_currency = 'usd' if currency in self.rates else currency
+        try:
+            data = await self.prices.get_many([token], quote_currency)
+        except CoingeckoError as e:
+            return await ctx.send(embed=self.get_embed(
+                title='API error while fetching data',
+                description=f'{e}, please try again later',
+                color=0xFF0000
+            ))
+        if not data.get(token) or quote_currency not in data[token]:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFF0000,
+                title='API error while fetching data',
+                description=f'No {currency.upper()} price available for `{token}`'
+            ))
+        value = data[token][quote_currency] * amt
+        if quote_currency != currency:
+            value = self.rates.convert(value, currency)
 
-            embed = self.get_embed(
-                color=0xFFFF00,
-                title=f'{token.title()} Price',
-                url=f'{self.base_url}/en/coins/{token}'
-            )
-            embed.add_field(
-                name='Token Amt',
-                value=amt,
-                inline=True
-            )
-            embed.add_field(
-                name=f'Price ({currency.upper()})',
-                value=f'${data[token][currency] * amt:,}',
-                inline=True
+        embed = self.get_embed(
+            color=0xFFFF00,
+            title=f'{token.title()} Price',
+            url=f'{self.base_url}/en/coins/{token}'
+        )
+        embed.add_field(
+            name='Token Amt',
+            value=amt,
+            inline=True
+        )
+        embed.add_field(
+            name=f'Price ({currency.upper()})',
+            value=f'${value:,}',
+            inline=True
+        )
+        if quote_currency == 'usd':
+            others = self.rates.table(
+                data[token]['usd'] * amt,
+                self.client.config.get('coingecko_value_currencies', ['usd', 'eur', 'gbp', 'aud', 'btc', 'eth'])
             )
+            others.pop(currency, None)
+            if others:
+                embed.add_field(
+                    name='Other Currencies',
+                    value='```' + '\n'.join(
+                        f'{other.upper():<4} {amount:>20,.6f}' for other, amount in others.items()
+                    ) + '```',
+                    inline=False
+                )
         await ctx.send(embed=embed)
 
     @coin.command(
@@ -294,13 +1621,13 @@ class Coingecko(commands.Cog, name='Coin'):
     )
     async def token_graph(self, ctx, num_days: int, vs_currency: str, *tokens):
         """Price graph for token(s), {num_days} {vs_currency} {token1} {token2} {token3}..."""
-        if not self.tokens:
+        if not self.index.tokens:
             return await ctx.send(embed=self.get_embed(
                 color=0xFF0000,
                 title='API error while fetching data',
                 description='Unable to fetch tokens from API, please try again later'
             ))
-        if not self.currencies:
+        if not self.index.currencies:
             return await ctx.send(embed=self.get_embed(
                 color=0xFF0000,
                 title='API error while fetching data',
@@ -316,30 +1643,390 @@ class Coingecko(commands.Cog, name='Coin'):
                     description=f'Token: `{token_err}` invalid or not found!'
                 ))
 
-        if vs_currency not in self.currencies:
+        if vs_currency not in self.index.currencies:
             return await ctx.send(embed=self.get_embed(
                 color=0xFFFF00,
                 title='User input error',
                 description=f'{vs_currency.upper()} not found, supported currencies:\n'
-                            f'```{", ".join(self.currencies)}```'
+                            f'```{", ".join(sorted(self.index.currencies))}```'
             ))
 
         await ctx.typing()
 
-        if await self.create_tokens_graph(ctx, num_days, vs_currency, *tokens):
+        png = await self.create_tokens_graph(ctx, num_days, vs_currency, *tokens)
+        if png:
             img_name = 'tokens_graph.png'
-            with open(img_name, 'rb') as token_graph:
-                file = File(token_graph, filename=img_name)
-                embed = self.get_embed(
-                    title='Token graph')
-                embed.set_image(url=f'attachment://{img_name}')
-                await ctx.send(file=file, embed=embed)
+            file = File(io.BytesIO(png), filename=img_name)
+            embed = self.get_embed(
+                title='Token graph')
+            embed.set_image(url=f'attachment://{img_name}')
+            await ctx.send(file=file, embed=embed)
+
+    @coin.command(
+        name='markets',
+        aliases=['top', 'mc']
+    )
+    async def token_markets(self, ctx, num: int = 25, currency: str = None):
+        """Top {num} tokens by market cap in {currency} (default USD)"""
+        currency = (currency or self.currency).lower()
+        if self.index.currencies and currency not in self.index.currencies:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFFFF00,
+                title='User input error',
+                description=f'{currency.upper()} not found, supported currencies:\n'
+                            f'```{", ".join(sorted(self.index.currencies))}```'
+            ))
+        num = max(1, min(num, self.client.config.get('coingecko_markets_max', 250)))
+        pages = list(range(1, (num - 1) // self.MARKETS_PAGE_SIZE + 2))
+        try:
+            data = await self.markets.get_many(pages, currency)
+        except CoingeckoError as e:
+            return await ctx.send(embed=self.get_embed(
+                title='API error while fetching data',
+                description=f'{e}, please try again later',
+                color=0xFF0000
+            ))
+        rows = [row for page in pages for row in data.get(page) or ()][:num]
+
+        paginator = commands.Paginator(prefix='```', suffix='```', max_size=2000)
+        paginator.add_line(
+            f'{"#":>4} {"Symbol":<8} {"Price " + currency.upper():>16} {"24h":>8} {"Market Cap":>18}'
+        )
+        for rank, symbol, price, change, market_cap in rows:
+            paginator.add_line(
+                f'{rank or "-":>4} {symbol.upper()[:8]:<8} {price or 0:>16,.8g} '
+                f'{change or 0:>7.2f}% {market_cap or 0:>18,.0f}'
+            )
+        for page in paginator.pages:
+            await ctx.send(page)
+
+    @coin.command(
+        name='candles',
+        aliases=['ohlc', 'candle']
+    )
+    async def token_candles(self, ctx, token: str, num_days: int = 30, vs_currency: str = None,
+                            *indicators):
+        """Candlestick chart, {token} {num_days} {vs_currency} {sma20 ema50 bb rsi...}"""
+        vs_currency = (vs_currency or self.currency).lower()
+        token_id = self.get_token(token)
+        if not token_id:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFF0000,
+                title='User input error',
+                description=f'Token: `{token}` invalid or not found!'
+            ))
+        if self.index.currencies and vs_currency not in self.index.currencies:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFFFF00,
+                title='User input error',
+                description=f'{vs_currency.upper()} not found, supported currencies:\n'
+                            f'```{", ".join(sorted(self.index.currencies))}```'
+            ))
+        parsed = [parse_indicator(indicator) for indicator in indicators]
+        if None in parsed:
+            bad = ', '.join(i for i, p in zip(indicators, parsed) if p is None)
+            return await ctx.send(embed=self.get_embed(
+                color=0xFFFF00,
+                title='User input error',
+                description=f'Unknown indicator `{bad}`, use sma, ema, rsi or bb '
+                            'with an optional period eg. `sma50`'
+            ))
+        # the ohlc endpoint only takes these day ranges, candle size follows from the range
+        num_days = next((days for days in (1, 7, 14, 30, 90, 180, 365) if days >= num_days), 365)
+
+        key = ('candles', num_days, vs_currency, token_id, tuple(parsed))
+        png = self.graphs.get(key)
+        if not png:
+            if not self.renderer.try_reserve():
+                return await ctx.send(embed=self.get_embed(
+                    color=0xFF0000,
+                    title='Too many graphs requested',
+                    description='Chirpy is busy drawing other graphs, please try again shortly'
+                ))
+            try:
+                await ctx.typing()
+                ohlc, error = await self.fetch_ohlc(token_id, vs_currency, num_days)
+                if error:
+                    return await ctx.send(embed=self.get_embed(
+                        color=0xFF0000,
+                        title='API error while fetching data',
+                        description=f'Unable to fetch candles from CoinGecko API for {token_id}: {error}'
+                    ))
+                png = await self.renderer.render(
+                    render_candles,
+                    f'{token_id.title()} - Last {num_days} Days',
+                    f'Price {vs_currency.upper()}',
+                    ohlc,
+                    parsed,
+                )
+                self.graphs.put(key, png)
+            finally:
+                self.renderer.release()
+
+        img_name = 'token_candles.png'
+        embed = self.get_embed(title='Token candles')
+        embed.set_image(url=f'attachment://{img_name}')
+        await ctx.send(file=File(io.BytesIO(png), filename=img_name), embed=embed)
+
+    @coin.group(
+        name='portfolio',
+        aliases=['pf', 'bag'],
+        invoke_without_command=True
+    )
+    async def portfolio(self, ctx, currency: str = None):
+        """Value of your stored holdings in {currency} (default USD)"""
+        currency = (currency or self.currency).lower()
+        holdings = self.portfolios.frame({ctx.author.id})
+        if holdings.empty:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFFFF00,
+                title='Portfolio',
+                description='Your portfolio is empty, add tokens with `coin portfolio set {token} {amount}`'
+            ))
+        try:
+            holdings = await self.value_holdings(holdings, currency)
+        except CoingeckoError as e:
+            return await ctx.send(embed=self.get_embed(
+                title='API error while fetching data',
+                description=f'{e}, please try again later',
+                color=0xFF0000
+            ))
+
+        total = holdings['value'].sum()
+        total_24h = holdings['value_24h'].sum()
+        change = (total / total_24h - 1) * 100 if total_24h else 0
+        holdings = holdings.sort_values('value', ascending=False, na_position='last')
+        lines = [
+            f'{token[:18]:<18} {amount:>14,.4f} '
+            + (f'{value:>16,.2f} {pct:>7.2f}%' if pd.notna(value) else f'{"no price":>16}')
+            for token, amount, value, pct in zip(
+                holdings['token'], holdings['amount'], holdings['value'], holdings['change'].fillna(0)
+            )
+        ]
+        embed = self.get_embed(
+            color=0xFFFF00,
+            title=f'{ctx.author.display_name}\'s Portfolio',
+            description='```' + '\n'.join(lines)[:4000] + '```'
+        )
+        embed.add_field(name=f'Total ({currency.upper()})', value=f'{total:,.2f}', inline=True)
+        embed.add_field(name='24hr Change', value=f'{change:,.2f}%', inline=True)
+        await ctx.send(embed=embed)
+
+    @portfolio.command(
+        name='set',
+        aliases=['add']
+    )
+    async def portfolio_set(self, ctx, token: str, amount: float):
+        """Set how much of {token} you hold, an {amount} of 0 removes it"""
+        token_id = self.get_token(token)
+        if not token_id:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFF0000,
+                title='User input error',
+                description=f'Token: `{token}` invalid or not found!'
+            ))
+        if amount < 0:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFFFF00,
+                title='User input error',
+                description=f'Amount `{amount}` not a valid amount.'
+            ))
+        self.portfolios.set(ctx.author.id, token_id, amount)
+        await ctx.send(embed=self.get_embed(
+            color=0xFFFF00,
+            title='Portfolio updated',
+            description=f'`{token_id}`: {amount:,}' if amount else f'`{token_id}` removed'
+        ))
+
+    @portfolio.command(
+        name='top',
+        aliases=['leaderboard', 'lb']
+    )
+    async def portfolio_top(self, ctx, currency: str = None):
+        """Largest portfolios in this server in {currency} (default USD)"""
+        currency = (currency or self.currency).lower()
+        members = {member.id: member for member in ctx.guild.members}
+        holdings = self.portfolios.frame(members.keys())
+        if holdings.empty:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFFFF00,
+                title='Portfolio Leaderboard',
+                description='Nobody in this server has a portfolio yet'
+            ))
+        try:
+            holdings = await self.value_holdings(holdings, currency)
+        except CoingeckoError as e:
+            return await ctx.send(embed=self.get_embed(
+                title='API error while fetching data',
+                description=f'{e}, please try again later',
+                color=0xFF0000
+            ))
+        totals = holdings.groupby('user')['value'].sum().nlargest(10)
+        lines = [
+            f'{rank:>2}. {members[user].display_name[:20]:<20} {value:>16,.2f}'
+            for rank, (user, value) in enumerate(totals.items(), start=1)
+        ]
+        await ctx.send(embed=self.get_embed(
+            color=0xFFFF00,
+            title=f'Portfolio Leaderboard ({currency.upper()})',
+            description='```' + '\n'.join(lines) + '```'
+        ))
+
+    @coin.group(
+        name='ticker',
+        aliases=['live'],
+        invoke_without_command=True
+    )
+    @commands.check(lambda ctx: ctx.bot.user_is_admin(ctx.author))
+    async def ticker(self, ctx, currency: str, *tokens):
+        """Pin a live price message for {token1} {token2}... in {currency} to this channel"""
+        currency = currency.lower()
+        if self.index.currencies and currency not in self.index.currencies:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFFFF00,
+                title='User input error',
+                description=f'{currency.upper()} not found, supported currencies:\n'
+                            f'```{", ".join(sorted(self.index.currencies))}```'
+            ))
+        token_ids = list(dict.fromkeys(self.get_token(token) for token in tokens))
+        if not token_ids or None in token_ids or len(token_ids) > 25:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFF0000,
+                title='User input error',
+                description='Give between 1 and 25 valid tokens for the ticker'
+            ))
+        ticker = {'tokens': token_ids, 'currency': currency}
+        try:
+            data = await self.prices.get_many(token_ids, currency)
+        except CoingeckoError:
+            data = {}
+        embed = self.ticker_embed(ticker, data) or self.get_embed(
+            color=0xFFFF00,
+            title=f'Live Prices ({currency.upper()})',
+            description='Waiting for prices...'
+        )
+        message = await ctx.send(embed=embed)
+        try:
+            await message.pin()
+        except (Forbidden, HTTPException):
+            pass
+        self.tickers.set(ctx.channel.id, message.id, token_ids, currency)
+
+    @ticker.command(
+        name='stop'
+    )
+    @commands.check(lambda ctx: ctx.bot.user_is_admin(ctx.author))
+    async def ticker_stop(self, ctx):
+        """Stop the live price message in this channel"""
+        if not self.tickers.remove(ctx.channel.id):
+            return await ctx.send(embed=self.get_embed(
+                color=0xFFFF00,
+                title='Live Prices',
+                description='There is no ticker in this channel'
+            ))
+        await ctx.send(embed=self.get_embed(
+            color=0xFFFF00,
+            title='Live Prices',
+            description='Ticker stopped'
+        ))
+
+    @coin.command(
+        name='alert',
+        aliases=['notify', 'watch']
+    )
+    async def price_alert(self, ctx, token: str, price: float, currency: str = None):
+        """Get pinged when {token} crosses {price} in {currency} (default USD)"""
+        currency = (currency or self.currency).lower()
+        token_id = self.get_token(token)
+        if not token_id:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFF0000,
+                title='User input error',
+                description=f'Token: `{token}` invalid or not found!'
+            ))
+        if self.index.currencies and currency not in self.index.currencies:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFF0000,
+                title='User input error',
+                description=f'{currency.upper()} not found, supported currencies:\n'
+                f'```{", ".join(sorted(self.index.currencies))}```'
+            ))
+        if not math.isfinite(price) or price <= 0:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFF0000,
+                title='User input error',
+                description=f'Price `{price}` not a valid price.'
+            ))
+        if len(self.alerts.for_user(ctx.author.id)) >= self.client.config.get('coingecko_alerts_per_user', 25):
+            return await ctx.send(embed=self.get_embed(
+                color=0xFF0000,
+                title='Too many alerts',
+                description='Remove some of your alerts with `coin unalert` first'
+            ))
+
+        try:
+            current = (await self.prices.get_many([token_id], currency)).get(token_id) or {}
+        except CoingeckoError:
+            current = {}
+        # the price right now is this alert's starting point, not whatever was polled last
+        alert = self.alerts.add(
+            token_id, currency, price, ctx.author.id, ctx.channel.id, current.get(currency)
+        )
+        description = f'I will ping you when `{token_id}` crosses {price:,} {currency.upper()}'
+        if currency in current:
+            description += f'\nCurrent price: {current[currency]:,} {currency.upper()}'
+        await ctx.send(embed=self.get_embed(
+            color=0xFFFF00,
+            title=f'Alert #{alert["id"]} created',
+            description=description
+        ))
+
+    @coin.command(
+        name='alerts'
+    )
+    async def price_alerts_list(self, ctx):
+        """List your price alerts"""
+        alerts = self.alerts.for_user(ctx.author.id)
+        if not alerts:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFFFF00,
+                title='Price Alerts',
+                description='You have no price alerts, add one with `coin alert`'
+            ))
+        lines = [
+            f'#{alert["id"]:<5} {alert["token"]} @ {alert["threshold"]:,} {alert["currency"].upper()}'
+            for alert in alerts
+        ]
+        await ctx.send(embed=self.get_embed(
+            color=0xFFFF00,
+            title='Price Alerts',
+            description='```' + '\n'.join(lines) + '```'
+        ))
+
+    @coin.command(
+        name='unalert',
+        aliases=['unwatch']
+    )
+    async def price_alert_remove(self, ctx, alert_id: int):
+        """Remove price alert {alert_id}"""
+        alert = self.alerts.alerts.get(alert_id)
+        if not alert or alert['user'] != ctx.author.id:
+            return await ctx.send(embed=self.get_embed(
+                color=0xFF0000,
+                title='User input error',
+                description=f'Alert `#{alert_id}` not found!'
+            ))
+        self.alerts.remove(alert_id)
+        await ctx.send(embed=self.get_embed(
+            color=0xFFFF00,
+            title=f'Alert #{alert_id} removed',
+            description=f'`{alert["token"]}` @ {alert["threshold"]:,} {alert["currency"].upper()}'
+        ))
 
     async def get_data_safely(self, ctx, response):
         """Fetch the json data from the response or return a user friendly message from the API"""
-        data = await response.json()
         if response.status == 200:
-            return data
+            return decode_json(await response.read())
         msg = 'Unable to process response from CoinGecko API' \
             f'\n{response.status} - {response.reason}'
         # do we have context so we can inform the user?
@@ -358,6 +2045,119 @@ class Coingecko(commands.Cog, name='Coin'):
     # Cog Tasks
     # ----------------------------------------------
 
+    @tasks.loop(seconds=60)
+    async def price_alerts(self):
+        """check every watched token against its alerts with one batched price call"""
+        token_ids, currencies = self.alerts.watched()
+        if not token_ids:
+            return
+        try:
+            data = {}
+            for i in range(0, len(token_ids), self.batcher.max_ids):
+                data.update(await self.fetch_prices(
+                    token_ids[i:i + self.batcher.max_ids], currencies, CoingeckoClient.BACKGROUND
+                ))
+        except CoingeckoError:
+            return
+
+        fired = []
+        for token_id, currency in list(self.alerts.thresholds):
+            price = data.get(token_id, {}).get(currency)
+            if price is not None:
+                fired += self.alerts.crossed(token_id, currency, price)
+        if not fired:
+            return
+        self.alerts.save()
+
+        if self.alert_sender is None or self.alert_sender.done():
+            self.alert_sender = asyncio.create_task(self.send_alerts())
+        for alert in fired:
+            price = data[alert['token']][alert['currency']]
+            try:
+                self.alert_queue.put_nowait((alert, price))
+            except asyncio.QueueFull:
+                print(f'Price alert queue full, dropped alert #{alert["id"]}')
+
+    @tasks.loop(seconds=20)
+    async def prefetch_prices(self):
+        """keep the most requested prices warm so they are served from the cache"""
+        hot = self.prices.usage.top(self.client.config.get('coingecko_prefetch_top', 25))
+        if not hot:
+            return
+        token_ids = sorted({token_id for token_id, _ in hot})
+        currencies = sorted({currency for _, currency in hot})
+        try:
+            data = await self.fetch_prices(token_ids, currencies, CoingeckoClient.BACKGROUND)
+        except CoingeckoError:
+            return
+        self.prices.prime(data, hot)
+
+    @tasks.loop(seconds=60)
+    async def live_tickers(self):
+        """refresh every live ticker from one batched price call, editing only changed ones"""
+        if not self.tickers.tickers:
+            return
+        token_ids = sorted({token for ticker in self.tickers.tickers.values() for token in ticker['tokens']})
+        currencies = sorted({ticker['currency'] for ticker in self.tickers.tickers.values()})
+        try:
+            data = {}
+            for i in range(0, len(token_ids), self.batcher.max_ids):
+                data.update(await self.fetch_prices(
+                    token_ids[i:i + self.batcher.max_ids], currencies, CoingeckoClient.BACKGROUND
+                ))
+        except CoingeckoError:
+            return
+
+        spacing = self.client.config.get('coingecko_ticker_edit_spacing', 0.5)
+        for channel_id, ticker in list(self.tickers.tickers.items()):
+            embed = self.ticker_embed(ticker, data)
+            if embed is None or self.tickers.rendered.get(channel_id) == embed.description:
+                continue
+            channel = self.client.get_channel(channel_id)
+            if channel is None:
+                continue
+            try:
+                await channel.get_partial_message(ticker['message']).edit(embed=embed)
+            except NotFound:
+                # message or channel is gone, nothing left to keep up to date
+                self.tickers.remove(channel_id)
+                continue
+            except HTTPException as e:
+                print(f'Unable to update price ticker in {channel_id}: {e}')
+                continue
+            self.tickers.rendered[channel_id] = embed.description
+            # spread the edits out so a lot of tickers stay clear of discord's rate limits
+            await asyncio.sleep(spacing)
+
+    @live_tickers.before_loop
+    async def before_live_tickers(self):
+        await self.client.wait_until_ready()
+
+    @price_alerts.before_loop
+    async def before_price_alerts(self):
+        await self.client.wait_until_ready()
+
+    async def send_alerts(self):
+        """deliver triggered alerts one at a time so a burst can't flood discord"""
+        while True:
+            alert, price = await self.alert_queue.get()
+            channel = self.client.get_channel(alert['channel'])
+            if channel is None:
+                continue
+            try:
+                await channel.send(
+                    f'<@{alert["user"]}>',
+                    embed=self.get_embed(
+                        color=0xFFFF00,
+                        title=f'{alert["token"].title()} crossed {alert["threshold"]:,} '
+                              f'{alert["currency"].upper()}',
+                        url=f'{self.base_url}en/coins/{alert["token"]}',
+                        description=f'Current price: {price:,} {alert["currency"].upper()}'
+                    )
+                )
+            except HTTPException as e:
+                print(f'Unable to deliver price alert #{alert["id"]}: {e}')
+
 
 async def setup(client):
     """This is called when the cog is loaded via load_extension"""
@@ -9,24 +9,314 @@ It collects informmation about helium miners...
     ├ blocktrasheight       Get transactions for a block at a given height
     ├ blockathash           Get block descriptor for the given block hash
     ├ blocktranshash        [WIP] Get transactions for a block at a given block hash
-    ├ listaccounts          [WIP] Retrieve the current set of known accounts
+    ├ listaccounts          Retrieve the current set of known accounts
     ├ accountaddress        Retrieve a specific account record
     ├ hotspotsaccount       Fetches hotspots owned by a given account address
     ├ validatorsaccount     Fetches validators owned by a given account address
     ├ ouisaccount           Fetches OUIs owned by a given account address
     ├ minerdistance         Fetches distance between 2 helium hotspots by animal name.
+    ├ near                  Hotspots near a lat/lon or another hotspot
     └ minername             Helium hotspot data for name
     --
     tosolana                Helium wallet converted to solana
 """
 
 import re
+import time
 import random
+import asyncio
+from difflib import get_close_matches
+from itertools import product
+from contextlib import asynccontextmanager
+import numpy as np
 from geopy.distance import geodesic
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import Embed
 
 
+class HeliumError(Exception):
+    """The helium api answered with something other than a 200"""
+    def __init__(self, status, reason):
+        super().__init__(f'Helium API error {status} - {reason}')
+        self.status = status
+
+
+class HeliumClient:
+    """Shared access to the helium api.
+
+    Paged endpoints are exposed as async generators following the `cursor` field. The
+    next page is requested while the current one is being consumed, and when a cursor
+    expires (the api answers 400) the listing restarts from the top, skipping the items
+    already handed out, so callers can stream any number of results in constant memory."""
+
+    def __init__(self, client, api_base, headers, max_restarts=3):
+        self.client = client
+        self.api_base = api_base
+        self.headers = headers
+        self.max_restarts = max_restarts
+
+    @asynccontextmanager
+    async def get(self, path, **params):
+        """session.get against the api with our headers"""
+        async with self.client.session.get(
+            f'{self.api_base}{path}', params=params or None, headers=self.headers
+        ) as response:
+            yield response
+
+    async def _page(self, path, params, cursor):
+        if cursor:
+            params = {**params, 'cursor': cursor}
+        async with self.get(path, **params) as response:
+            if response.status != 200:
+                raise HeliumError(response.status, response.reason)
+            return await response.json()
+
+    async def pages(self, path, **params):
+        """yield the `data` list of each page of a paged endpoint"""
+        restarts = 0
+        handed_out = 0
+        skip = 0
+        cursor = None
+        pending = asyncio.create_task(self._page(path, params, None))
+        try:
+            while pending:
+                try:
+                    page = await pending
+                except HeliumError as e:
+                    if e.status != 400 or not cursor or restarts >= self.max_restarts:
+                        raise
+                    # cursor expired, start over and skip what the caller already has
+                    restarts += 1
+                    skip = handed_out
+                    cursor = None
+                    pending = asyncio.create_task(self._page(path, params, None))
+                    continue
+                cursor = page.get('cursor')
+                pending = asyncio.create_task(self._page(path, params, cursor)) if cursor else None
+                data = page.get('data') or []
+                if skip:
+                    data, skip = data[skip:], max(skip - len(data), 0)
+                if data:
+                    handed_out += len(data)
+                    yield data
+        finally:
+            if pending:
+                pending.cancel()
+
+    async def paginate(self, path, limit=None, **params):
+        """yield the items of a paged endpoint one at a time, stopping after limit items"""
+        count = 0
+        pages = self.pages(path, **params)
+        try:
+            async for data in pages:
+                for item in data:
+                    if limit is not None and count >= limit:
+                        return
+                    count += 1
+                    yield item
+        finally:
+            await pages.aclose()
+
+
+class HotspotCache:
+    """Hotspot records by name with a time to live.
+
+    A name can map to several hotspots, so each name holds a list of records. Lookups of a
+    name that is already being fetched wait for that fetch instead of starting another."""
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.by_name = {}
+        self.inflight = {}
+
+    def _fresh(self, entry):
+        return entry is not None and entry[0] > time.monotonic()
+
+    def name(self, name):
+        entry = self.by_name.get(name)
+        return entry[1] if self._fresh(entry) else None
+
+    def put(self, name, records):
+        expires = time.monotonic() + self.ttl
+        self.by_name[name] = (expires, records)
+
+    def prune(self):
+        now = time.monotonic()
+        self.by_name = {k: v for k, v in self.by_name.items() if v[0] > now}
+
+
+def edit_distance(a: str, b: str):
+    """levenshtein distance between two short strings"""
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        previous = current
+    return previous[-1]
+
+
+class HotspotIndex:
+    """Snapshot of every hotspot name plus the located hotspots in flat numpy arrays
+    behind a lat/lng grid.
+
+    Rows are sorted by grid cell so every cell is one contiguous slice found with
+    searchsorted. A radius query only measures the hotspots in the cells overlapping the
+    search box, and names are looked up through sorted arrays instead of a dict. The name
+    index also covers hotspots without a location, those just have no grid row."""
+    CELL = 0.1
+    COLUMNS = int(360 / CELL) + 1
+    EARTH_KM = 6371.0088
+
+    def __init__(self, addresses, names, lat, lng, online, known_names):
+        cells = self._cells(lat, lng)
+        order = np.argsort(cells, kind='stable')
+        self.cells = cells[order]
+        self.addresses = addresses[order]
+        self.names = names[order]
+        self.lat = lat[order]
+        self.lng = lng[order]
+        self.online = online[order]
+        self.name_order = np.argsort(self.names, kind='stable')
+        self.located_names = self.names[self.name_order]
+        # every name on the network, located or not, sorted and without duplicates
+        self.sorted_names = np.unique(known_names)
+        # animal names are adjective-colour-animal, each position has a small vocabulary
+        self.words = [set(), set(), set()]
+        for name in self.sorted_names.tolist():
+            for vocabulary, word in zip(self.words, name.decode().split('-')):
+                vocabulary.add(word)
+        self.words = [frozenset(vocabulary) for vocabulary in self.words]
+        self.built = time.time()
+
+    @staticmethod
+    def chunk(page):
+        """project one page of hotspot records down to the indexed columns, hotspots
+        without a location only contribute their name"""
+        rows = [
+            (hs['address'], hs['name'], hs['lat'], hs['lng'], hs['status']['online'] == 'online')
+            for hs in page
+            if hs.get('lat') is not None and hs.get('lng') is not None
+        ]
+        addresses, names, lat, lng, online = zip(*rows) if rows else ((),) * 5
+        return (
+            np.array(addresses, dtype='S'),
+            np.array(names, dtype='S'),
+            np.array(lat, dtype=np.float32),
+            np.array(lng, dtype=np.float32),
+            np.array(online, dtype=bool),
+            np.array([hs['name'] for hs in page], dtype='S'),
+        )
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """build from the column chunks of every page"""
+        if not chunks:
+            chunks = [cls.chunk([])]
+        return cls(*(np.concatenate(column) for column in zip(*chunks)))
+
+    def __len__(self):
+        return len(self.cells)
+
+    @classmethod
+    def _cells(cls, lat, lng):
+        rows = np.floor((np.asarray(lat, dtype=float) + 90) / cls.CELL).astype(np.int64)
+        cols = np.floor((np.asarray(lng, dtype=float) + 180) / cls.CELL).astype(np.int64)
+        return rows * cls.COLUMNS + cols
+
+    def find(self, name: str):
+        """grid position of the located hotspot with this dashed animal name, or None"""
+        key = name.encode()
+        i = np.searchsorted(self.located_names, key)
+        if i < len(self.located_names) and self.located_names[i] == key:
+            return int(self.name_order[i])
+        return None
+
+    def known(self, name: str):
+        """True when some hotspot in the snapshot, located or not, has this name"""
+        key = name.encode()
+        i = np.searchsorted(self.sorted_names, key)
+        return bool(i < len(self.sorted_names) and self.sorted_names[i] == key)
+
+    def plausible(self, name: str):
+        """True when every word of a three word name is one the map has seen in its position,
+        such a name may belong to a hotspot newer than the snapshot"""
+        words = name.split('-')
+        return len(words) == 3 and all(word in vocabulary for word, vocabulary in zip(words, self.words))
+
+    def startswith(self, prefix: str, limit: int = 10):
+        """names starting with prefix in alphabetical order, the sorted names act as a trie"""
+        key = prefix.encode()
+        start = np.searchsorted(self.sorted_names, key, side='left')
+        stop = np.searchsorted(self.sorted_names, key + b'\xff', side='left')
+        return [name.decode() for name in self.sorted_names[start:min(stop, start + limit)].tolist()]
+
+    def suggest(self, name: str, limit: int = 5):
+        """known names close to a mistyped or partial one, best match first"""
+        words = name.split('-')
+        if len(words) == 3:
+            # swap each word for its nearest words from the vocabulary of its position
+            options = [
+                list(dict.fromkeys(
+                    ([word] if word in vocabulary else [])
+                    + get_close_matches(word, vocabulary, n=3, cutoff=0.6)
+                ))
+                for word, vocabulary in zip(words, self.words)
+            ]
+            scored = sorted(
+                (sum(edit_distance(a, b) for a, b in zip(words, candidate)), '-'.join(candidate))
+                for candidate in product(*options)
+            )
+            found = [candidate for _, candidate in scored if self.known(candidate)]
+        else:
+            found = []
+        for candidate in self.startswith(name, limit):
+            if candidate not in found:
+                found.append(candidate)
+        return found[:limit]
+
+    def near(self, lat: float, lng: float, radius_km: float, limit: int = 25):
+        """[(position, distance km)] of the closest hotspots within radius_km, nearest first"""
+        dlat = radius_km / 111.32
+        dlng = radius_km / (111.32 * max(np.cos(np.radians(lat)), 0.01))
+        row_lo, col_lo = divmod(int(self._cells(max(lat - dlat, -90), max(lng - dlng, -180))), self.COLUMNS)
+        row_hi, col_hi = divmod(int(self._cells(min(lat + dlat, 90), min(lng + dlng, 180))), self.COLUMNS)
+        slices = []
+        for row in range(row_lo, row_hi + 1):
+            start = np.searchsorted(self.cells, row * self.COLUMNS + col_lo, side='left')
+            stop = np.searchsorted(self.cells, row * self.COLUMNS + col_hi, side='right')
+            if stop > start:
+                slices.append(np.arange(start, stop))
+        if not slices:
+            return []
+        candidates = np.concatenate(slices)
+
+        # haversine over just the candidates
+        lat1, lng1 = np.radians(lat), np.radians(lng)
+        lat2 = np.radians(self.lat[candidates].astype(float))
+        lng2 = np.radians(self.lng[candidates].astype(float))
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+        distance = 2 * self.EARTH_KM * np.arcsin(np.sqrt(a))
+
+        inside = distance <= radius_km
+        candidates, distance = candidates[inside], distance[inside]
+        nearest = np.argsort(distance)[:limit]
+        return list(zip(candidates[nearest].tolist(), distance[nearest].tolist()))
+
+    def record(self, position: int):
+        return {
+            'address': self.addresses[position].decode(),
+            'name': self.names[position].decode(),
+            'lat': float(self.lat[position]),
+            'lng': float(self.lng[position]),
+            'online': bool(self.online[position]),
+        }
+
+
 class Helium(commands.Cog, name='Helium'):
     def __init__(self, client):
         self.client = client
@@ -37,6 +327,133 @@ class Helium(commands.Cog, name='Helium'):
             'Content-Type': 'application/json; charset=utf-8',
             'User-Agent': 'Discord python helium bot bar moo oink'
         }
+        self.api = HeliumClient(client, self.api_base, self.headers)
+        self.hotspots = HotspotCache(ttl=client.config.get('helium_hotspot_ttl', 300))
+        self.hotspot_index = None
+
+        self.hotspot_snapshot.change_interval(  # pylint: disable=E1101
+            hours=client.config.get('helium_snapshot_hours', 6)
+        )
+        self.hotspot_snapshot.start()  # pylint: disable=E1101
+
+        # network wide stats kept warm in the background, path -> (fetched at, data)
+        self.network = {}
+        self.network_inflight = {}
+        self.network_max_age = client.config.get('helium_stats_max_age', 300)
+        self.network_refresh.change_interval(  # pylint: disable=E1101
+            seconds=client.config.get('helium_stats_refresh', 60)
+        )
+        self.network_refresh.start()  # pylint: disable=E1101
+
+    async def cog_unload(self):
+        self.hotspot_snapshot.cancel()  # pylint: disable=E1101
+        self.network_refresh.cancel()  # pylint: disable=E1101
+
+    def hotspot_not_found(self, words, suggestions=()):
+        """embed for an unknown hotspot name with any close matches we know of"""
+        description = f'Hotspot with name ```{" ".join(word.title() for word in words)}``` not found.'
+        if suggestions:
+            description += '\nDid you mean:\n' + '\n'.join(
+                ' '.join(word.title() for word in suggestion.split('-')) for suggestion in suggestions
+            )
+        embed = Embed(
+            description=description,
+            color=random.randint(0, 0xFFFFFF)
+        )
+        embed.set_author(
+            name='Helium Hotspot Not Found!',
+            icon_url=self.hnt_image
+        )
+        return embed
+
+    async def _fetch_network(self, path):
+        async with self.api.get(path) as response:
+            if response.status != 200:
+                raise HeliumError(response.status, response.reason)
+            self.network[path] = (time.time(), (await response.json())['data'])
+        return self.network[path]
+
+    def _network_fetch(self, path):
+        """the running fetch of path, started if there is none so callers share one request"""
+        if path not in self.network_inflight:
+            task = asyncio.create_task(self._fetch_network(path))
+            task.add_done_callback(lambda _: self.network_inflight.pop(path, None))
+            self.network_inflight[path] = task
+        return self.network_inflight[path]
+
+    async def network_stat(self, path):
+        """network stats from memory, fetched on the spot only when too old to serve.
+        If that fetch fails the last copy is served anyway, with its real age"""
+        entry = self.network.get(path)
+        if entry is None or time.time() - entry[0] > self.network_max_age:
+            try:
+                entry = await asyncio.shield(self._network_fetch(path))
+            except Exception:  # pylint: disable=W0703
+                if entry is None:
+                    raise
+        fetched, data = entry
+        return data, time.time() - fetched
+
+    @staticmethod
+    def data_age(age):
+        return f'Data {age:,.0f} seconds old'
+
+    async def hotspots_by_name(self, name):
+        """hotspot records for a 3-word animal name, served from the cache when fresh"""
+        records = self.hotspots.name(name)
+        if records is not None:
+            return records
+        if name not in self.hotspots.inflight:
+            self.hotspots.inflight[name] = asyncio.create_task(self._fetch_hotspots(name))
+        try:
+            return await asyncio.shield(self.hotspots.inflight[name])
+        finally:
+            self.hotspots.inflight.pop(name, None)
+
+    async def _fetch_hotspots(self, name):
+        async with self.api.get(f'/v1/hotspots/name/{name}') as response:
+            if response.status != 200:
+                raise HeliumError(response.status, response.reason)
+            records = (await response.json())['data']
+        if len(self.hotspots.by_name) > 4096:
+            self.hotspots.prune()
+        self.hotspots.put(name, records)
+        return records
+
+    def helium_error(self, error):
+        """embed for a failed helium api request"""
+        embed = Embed(
+            description=f'```{error}```',
+            color=0xFF0000
+        )
+        embed.set_author(
+            name='API error while fetching data',
+            icon_url=self.hnt_image
+        )
+        return embed
+
+    async def send_lines(self, ctx, lines):
+        """send lines from an async iterator as code block messages as soon as each fills up,
+        returns the number of lines sent or None when the api request failed"""
+        count = 0
+        page = []
+        size = 0
+        try:
+            async for line in lines:
+                if size + len(line) + 1 > 1990 and page:
+                    await ctx.send('```' + '\n'.join(page) + '```')
+                    page, size = [], 0
+                page.append(line[:1990])
+                size += len(line) + 1
+                count += 1
+        except HeliumError as e:
+            if page:
+                await ctx.send('```' + '\n'.join(page) + '```')
+            await ctx.send(embed=self.helium_error(e))
+            return None
+        if page:
+            await ctx.send('```' + '\n'.join(page) + '```')
+        return count
 
     def locations(city: str):
         """
@@ -75,85 +492,83 @@ class Helium(commands.Cog, name='Helium'):
         Retrieve basic stats for the blockchain such as total token supply, and average block and
         election times over a number of intervals.
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/stats', headers=self.headers
-        ) as response:
-            data = (await response.json())['data']
-            hotspots = data['counts']['hotspots']
-            online = data['counts']['hotspots_online']
-            online_percent = (hotspots - online)/((hotspots + online) / 2) * 100
+        data, age = await self.network_stat('/v1/stats')
+        hotspots = data['counts']['hotspots']
+        online = data['counts']['hotspots_online']
+        online_percent = (hotspots - online)/((hotspots + online) / 2) * 100
 
-            embed = Embed(color=random.randint(0, 0xFFFFFF))
-            embed.set_author(
-                name='Helium Stats',
-                icon_url=self.hnt_image
-            )
-            embed.add_field(
-                name='Token Supply',
-                value=data['token_supply'],
-                inline=False
-            )
-            embed.add_field(
-                name='Validators',
-                value=data['counts']['validators'],
-                inline=True
-            )
-            embed.add_field(
-                name='Transactions',
-                value=data['counts']['transactions'],
-                inline=True
-            )
-            embed.add_field(
-                name='OUIs',
-                value=data['counts']['ouis'],
-                inline=True
-            )
-            embed.add_field(
-                name='Hotspots Online',
-                value=online,
-                inline=True
-            )
-            embed.add_field(
-                name='Data Only',
-                value=data['counts']['hotspots_dataonly'],
-                inline=True
-            )
-            embed.add_field(
-                name='Hotspots',
-                value=hotspots,
-                inline=True
-            )
-            embed.add_field(
-                name='Countries',
-                value=data['counts']['countries'],
-                inline=True
-            )
-            embed.add_field(
-                name='Cities',
-                value=data['counts']['cities'],
-                inline=True
-            )
-            embed.add_field(
-                name='Challenges',
-                value=data['counts']['challenges'],
-                inline=True
-            )
-            embed.add_field(
-                name='Blocks',
-                value=data['counts']['blocks'],
-                inline=True
-            )
-            embed.add_field(
-                name='Challenge Counts',
-                value=data['challenge_counts']['last_day'],
-                inline=True
-            )
-            embed.add_field(
-                name='Online Percent',
-                value=f'{round(online_percent, 2)}%',
-                inline=True
-            )
-            return await ctx.send(embed=embed)
+        embed = Embed(color=random.randint(0, 0xFFFFFF))
+        embed.set_author(
+            name='Helium Stats',
+            icon_url=self.hnt_image
+        )
+        embed.add_field(
+            name='Token Supply',
+            value=data['token_supply'],
+            inline=False
+        )
+        embed.add_field(
+            name='Validators',
+            value=data['counts']['validators'],
+            inline=True
+        )
+        embed.add_field(
+            name='Transactions',
+            value=data['counts']['transactions'],
+            inline=True
+        )
+        embed.add_field(
+            name='OUIs',
+            value=data['counts']['ouis'],
+            inline=True
+        )
+        embed.add_field(
+            name='Hotspots Online',
+            value=online,
+            inline=True
+        )
+        embed.add_field(
+            name='Data Only',
+            value=data['counts']['hotspots_dataonly'],
+            inline=True
+        )
+        embed.add_field(
+            name='Hotspots',
+            value=hotspots,
+            inline=True
+        )
+        embed.add_field(
+            name='Countries',
+            value=data['counts']['countries'],
+            inline=True
+        )
+        embed.add_field(
+            name='Cities',
+            value=data['counts']['cities'],
+            inline=True
+        )
+        embed.add_field(
+            name='Challenges',
+            value=data['counts']['challenges'],
+            inline=True
+        )
+        embed.add_field(
+            name='Blocks',
+            value=data['counts']['blocks'],
+            inline=True
+        )
+        embed.add_field(
+            name='Challenge Counts',
+            value=data['challenge_counts']['last_day'],
+            inline=True
+        )
+        embed.add_field(
+            name='Online Percent',
+            value=f'{round(online_percent, 2)}%',
+            inline=True
+        )
+        embed.set_footer(text=self.data_age(age))
+        return await ctx.send(embed=embed)
 
     ##########
     # helium token supply
@@ -164,22 +579,20 @@ class Helium(commands.Cog, name='Helium'):
         GET https://api.helium.io/v1/stats/token_supply
         Returns the circulating token supply in either JSON or raw form.
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/stats/token_supply', headers=self.headers
-        ) as response:
-            data = (await response.json())['data']
+        data, age = await self.network_stat('/v1/stats/token_supply')
 
-            embed = Embed(color=random.randint(0, 0xFFFFFF))
-            embed.set_author(
-                name='Helium Stats',
-                icon_url=self.hnt_image
-            )
-            embed.add_field(
-                name='Token Supply',
-                value=data['token_supply'],
-                inline=True
-            )
-            return await ctx.send(embed=embed)
+        embed = Embed(color=random.randint(0, 0xFFFFFF))
+        embed.set_author(
+            name='Helium Stats',
+            icon_url=self.hnt_image
+        )
+        embed.add_field(
+            name='Token Supply',
+            value=data['token_supply'],
+            inline=True
+        )
+        embed.set_footer(text=self.data_age(age))
+        return await ctx.send(embed=embed)
 
     ##########
     # helium blocks
@@ -194,25 +607,23 @@ class Helium(commands.Cog, name='Helium'):
         https://api.helium.io/v1/blocks/height?max_time=2022-07-20T23:05:00Z
         """
         if max_time is None:
-            async with self.client.session.get(
-                f'{self.api_base}/v1/blocks/height', headers=self.headers
-            ) as response:
-                data = (await response.json())['data']
+            data, age = await self.network_stat('/v1/blocks/height')
 
-                embed = Embed(color=random.randint(0, 0xFFFFFF))
-                embed.set_author(
-                    name='Blockheight',
-                    icon_url=self.hnt_image
-                )
-                embed.add_field(
-                    name='Current Block Height',
-                    value=data['height'],
-                    inline=True
-                )
+            embed = Embed(color=random.randint(0, 0xFFFFFF))
+            embed.set_author(
+                name='Blockheight',
+                icon_url=self.hnt_image
+            )
+            embed.add_field(
+                name='Current Block Height',
+                value=data['height'],
+                inline=True
+            )
+            embed.set_footer(text=self.data_age(age))
             return await ctx.send(embed=embed)
 
-        async with self.client.session.get(
-            f'{self.api_base}/v1/blocks/height?max_time={max_time}', headers=self.headers
+        async with self.api.get(
+            f'/v1/blocks/height?max_time={max_time}'
         ) as response:
             data = await response.json()
 
@@ -236,57 +647,56 @@ class Helium(commands.Cog, name='Helium'):
         Block Stats
         GET https://api.helium.io/v1/blocks/stats
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/blocks/stats', headers=self.headers
-        ) as response:
-            data = (await response.json())['data']
+        data, age = await self.network_stat('/v1/blocks/stats')
 
-            embed = Embed(color=random.randint(0, 0xFFFFFF))
-            embed.set_author(
-                name='Helium Blocks Stats',
-                icon_url=self.hnt_image
-            )
-            embed.add_field(
-                name='Last Month',
-                value=f'stddev: {data["last_month"]["stddev"]}\n'
-                      + f'Avg: {data["last_month"]["avg"]}',
-                inline=False
-            )
-            embed.add_field(
-                name='Last Week',
-                value=f'stddev: {data["last_week"]["stddev"]}\n'
-                      + f'Avg: {data["last_week"]["avg"]}',
-                inline=False
-            )
-            embed.add_field(
-                name='Last Day',
-                value=f'stddev: {data["last_day"]["stddev"]}\n'
-                      + f'Avg: {data["last_day"]["avg"]}',
-                inline=False
-            )
-            embed.add_field(
-                name='Last hour',
-                value=f'stddev: {data["last_hour"]["stddev"]}\n'
-                      + f'Avg: {data["last_hour"]["avg"]}',
-                inline=False
-            )
-            return await ctx.send(embed=embed)
+        embed = Embed(color=random.randint(0, 0xFFFFFF))
+        embed.set_author(
+            name='Helium Blocks Stats',
+            icon_url=self.hnt_image
+        )
+        embed.add_field(
+            name='Last Month',
+            value=f'stddev: {data["last_month"]["stddev"]}\n'
+                  + f'Avg: {data["last_month"]["avg"]}',
+            inline=False
+        )
+        embed.add_field(
+            name='Last Week',
+            value=f'stddev: {data["last_week"]["stddev"]}\n'
+                  + f'Avg: {data["last_week"]["avg"]}',
+            inline=False
+        )
+        embed.add_field(
+            name='Last Day',
+            value=f'stddev: {data["last_day"]["stddev"]}\n'
+                  + f'Avg: {data["last_day"]["avg"]}',
+            inline=False
+        )
+        embed.add_field(
+            name='Last hour',
+            value=f'stddev: {data["last_hour"]["stddev"]}\n'
+                  + f'Avg: {data["last_hour"]["avg"]}',
+            inline=False
+        )
+        embed.set_footer(text=self.data_age(age))
+        return await ctx.send(embed=embed)
 
     ##########
     # helium blocks
     @helium.command(name='blocks')
-    async def helium_blocks(self, ctx):
+    async def helium_blocks(self, ctx, limit: int = 10):
         """
         Block Descriptions
         GET https://api.helium.io/v1/blocks
         Retrieves block descriptions. Blocks descriptions are paged. A cursor field will be in the
         response when more results are available.
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/blocks', headers=self.headers
-        ) as response:
-            data = await response.json()
-            return await ctx.send(str(data)[:2000])
+        async def lines():
+            async for block in self.api.paginate('/v1/blocks', limit=limit):
+                yield (f'{block["height"]:>9} | {block["time"]:>10} | '
+                       f'{block["transaction_count"]:>5} txns | {block["hash"]}')
+
+        await self.send_lines(ctx, lines())
 
     ##########
     # helium block for height
@@ -297,8 +707,8 @@ class Helium(commands.Cog, name='Helium'):
         GET https://api.helium.io/v1/blocks/:height
         Get block descriptor for block at height
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/blocks/{height}', headers=self.headers
+        async with self.api.get(
+            f'/v1/blocks/{height}'
         ) as response:
             data = await response.json()
             return await ctx.send(data)
@@ -306,18 +716,19 @@ class Helium(commands.Cog, name='Helium'):
     ##########
     # helium block at height transaction
     @helium.command(name='blocktrasheight', aliases=['bth'])
-    async def helium_block_transaction_height(self, ctx, height: int):
+    async def helium_block_transaction_height(self, ctx, height: int, limit: int = 50):
         """
         Block at Height Transactions
         GET https://api.helium.io/v1/blocks/:height/transactions
         Get transactions for a block at a given height. The list of returned transactions is paged.
         A cursor field is present if more results are available.
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/blocks/{height}/transactions', headers=self.headers
-        ) as response:
-            data = await response.json()
-            return await ctx.send(data)
+        async def lines():
+            async for txn in self.api.paginate(f'/v1/blocks/{height}/transactions', limit=limit):
+                yield f'{txn["type"]:<24} {txn["hash"]}'
+
+        if await self.send_lines(ctx, lines()) == 0:
+            await ctx.send(f'No transactions found for block {height}')
 
     ##########
     # helium block at hash
@@ -328,8 +739,8 @@ class Helium(commands.Cog, name='Helium'):
         GET https://api.helium.io/v1/blocks/hash/:hash
         Get block descriptor for the given block hash.
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/blocks/hash/{hash}', headers=self.headers
+        async with self.api.get(
+            f'/v1/blocks/hash/{hash}'
         ) as response:
             data = await response.json()
             return await ctx.send(data)
@@ -345,8 +756,8 @@ class Helium(commands.Cog, name='Helium'):
         is paged.
         A cursor field is present if more results are available.
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/blocks/hash/{hash}/transactions', headers=self.headers
+        async with self.api.get(
+            f'/v1/blocks/hash/{hash}/transactions'
         ) as response:
             data = await response.json()
             return await ctx.send(data)
@@ -354,25 +765,21 @@ class Helium(commands.Cog, name='Helium'):
     ##########
     # helium accounts
     @helium.command(name='listaccounts', aliases=['la'])
-    async def helium_list_accounts(self, ctx, limit: int = 2):
+    async def helium_list_accounts(self, ctx, limit: int = 10):
         """
-        List Accounts [WIP]
+        List Accounts
         GET https://api.helium.io/v1/accounts
         Retrieve the current set of known accounts. The result is paged. A cursor field is present
         if more results are available.
         Note: The cursor for accounts is valid for a limited time. If you receive a 400 http
         response code for a cursor based request, you will need to start fetching accounts from
         the beginning of the list.
-
-        GET https://api.helium.io/v1/accounts/rich
-        GET https://api.helium.io/v1/accounts/rich?limit=:int
-        Returns up to 100 of the accounts sorted by highest token balance.
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/accounts/rich?limit={limit}', headers=self.headers
-        ) as response:
-            data = await response.json()
-            return await ctx.send(data)
+        async def lines():
+            async for account in self.api.paginate('/v1/accounts', limit=limit):
+                yield f'{account["address"]} | {account["balance"] / self.bones:>16,.8f} HNT'
+
+        await self.send_lines(ctx, lines())
 
     ##########
     # helium account for address
@@ -390,8 +797,8 @@ class Helium(commands.Cog, name='Helium'):
         the source account and use speculative_nonce + 1 for the new transaction nonce.Currently
         only the speculative_nonce is supported. It indicates the expected nonce for the account
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/accounts/{address}', headers=self.headers
+        async with self.api.get(
+            f'/v1/accounts/{address}'
         ) as response:
             data = await response.json()
             return await ctx.send(data)
@@ -414,49 +821,47 @@ class Helium(commands.Cog, name='Helium'):
         response code for a cursor
         based request, you will need to start fetching accounts from the beginning of the list.
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/accounts/{address}/hotspots', headers=self.headers
-        ) as response:
-            data = (await response.json())['data']
-            hotspots = [f"[View in explorer]({gw['name']})" for gw in data]
-
-            paginator = commands.Paginator(
-                prefix='```',
-                suffix='```',
-                linesep='\n',
-                max_size=2000
-            )
-            message = None
+        hotspots = self.api.paginate(f'/v1/accounts/{address}/hotspots')
 
-            all_fields = [' '.join(word.title() for word in gw['name'].split('-')) for gw in data]
+        # up to 25 hotspots fit in one embed, only look one past that before deciding
+        first = []
+        try:
+            async for gw in hotspots:
+                first.append(gw)
+                if len(first) > 25:
+                    break
+        except HeliumError as e:
+            return await ctx.send(embed=self.helium_error(e))
 
-            if len(all_fields) <= 25:
-                embed = Embed(
-                    color=random.randint(0, 0xFFFFFF),
-                    description=f'```Hotspots found for this address.\n{address}```',
-                )
-                embed.set_author(
-                    name=f'{len(hotspots)} Helium Hotspots Found',
-                    icon_url=self.hnt_image
-                )
-                [embed.add_field(
-                    name=' '.join(word.title() for word in gw['name'].split('-')),
-                    value=f'[View in explorer](https://explorer.helium.com/hotspots/{gw["address"]}/activity)',
-                    inline=False
-                ) for gw in data]
-                embed.set_footer(
-                    text='Provided By: https://api.helium.io'
-                )
-                return await ctx.send(embed=embed)
-            else:
-                for num, line in enumerate(all_fields):
-                    paginator.add_line(f'{num+1:3} | {line}')
+        if len(first) <= 25:
+            embed = Embed(
+                color=random.randint(0, 0xFFFFFF),
+                description=f'```Hotspots found for this address.\n{address}```',
+            )
+            embed.set_author(
+                name=f'{len(first)} Helium Hotspots Found',
+                icon_url=self.hnt_image
+            )
+            [embed.add_field(
+                name=' '.join(word.title() for word in gw['name'].split('-')),
+                value=f'[View in explorer](https://explorer.helium.com/hotspots/{gw["address"]}/activity)',
+                inline=False
+            ) for gw in first]
+            embed.set_footer(
+                text='Provided By: https://api.helium.io'
+            )
+            return await ctx.send(embed=embed)
 
-                for page in paginator.pages:
-                    await ctx.send(page)
+        async def lines():
+            num = 0
+            for gw in first:
+                num += 1
+                yield f'{num:3} | {" ".join(word.title() for word in gw["name"].split("-"))}'
+            async for gw in hotspots:
+                num += 1
+                yield f'{num:3} | {" ".join(word.title() for word in gw["name"].split("-"))}'
 
-                paginator.clear()
-                return message
+        await self.send_lines(ctx, lines())
 
     ##########
     # helium validators for account
@@ -468,8 +873,8 @@ class Helium(commands.Cog, name='Helium'):
         Fetches validators owned by a given account address. The list of returned validators is
         paged. If a cursor field is present more results are available.
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/accounts/{address}/validators', headers=self.headers
+        async with self.api.get(
+            f'/v1/accounts/{address}/validators'
         ) as response:
             data = await response.json()
             return await ctx.send(data)
@@ -484,8 +889,8 @@ class Helium(commands.Cog, name='Helium'):
         Fetches OUIs owned by a given account address. The list of returned OUIs is paged.
         If a cursor field is present more results are available.
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/accounts/{address}/ouis', headers=self.headers
+        async with self.api.get(
+            f'/v1/accounts/{address}/ouis'
         ) as response:
             data = await response.json()
             return await ctx.send(data)
@@ -504,80 +909,78 @@ class Helium(commands.Cog, name='Helium'):
         """
         gw_name = '-'.join((word.lower() for word in words[:3]))
 
-        async with self.client.session.get(
-            f'{self.api_base}/v1/hotspots/name/{gw_name}', headers=self.headers
-        ) as response:
-            resp = (await response.json())['data']
+        # a partial name or one with a word the hotspot map has never seen is a typo when the
+        # map has close matches, anything that could be a real name is looked up upstream
+        index = self.hotspot_index
+        if index is not None and not index.known(gw_name) and not index.plausible(gw_name):
+            suggestions = index.suggest(gw_name)
+            if suggestions:
+                return await ctx.send(embed=self.hotspot_not_found(words[:3], suggestions))
 
-            if len(resp) == 0:
-                embed = Embed(
-                    description=f'Hotspot with name ```{" ".join((word.title() for word in words[:3]))}``` not found.',
-                    color=random.randint(0, 0xFFFFFF)
-                )
-                embed.set_author(
-                    name='Helium Hotspot Not Found!',
-                    icon_url=self.hnt_image
-                )
-                return await ctx.send(embed=embed)
+        resp = await self.hotspots_by_name(gw_name)
 
-            embed = Embed(
-                title=f'{" ".join((word.title() for word in words[:3]))}',
-                url=f'https://explorer.helium.com/hotspots/{resp[0]["address"]}',
-            )
-            embed.set_author(
-                    name='Helium Hotspot Found!',
-                    icon_url=self.hnt_image
-                )
-            embed.add_field(
-                name='Location [lat, Lon]',
-                value=f'{round(resp[0]["lat"], 4)}, {round(resp[0]["lng"], 4)}',
-                inline=False
-            )
-            embed.add_field(
-                name='Date Added',
-                value=resp[0]['timestamp_added'][:10],
-                inline=True
-            )
-            embed.add_field(
-                name='Status',
-                value=resp[0]['status']['online'].title(),
-                inline=True
-            )
-            embed.add_field(
-                name='Hotspot Name',
-                value=resp[0]['mode'].title(),
-                inline=True
-            )
-            embed.add_field(
-                name='Location Hex',
-                value=resp[0]['location_hex'],
-                inline=True
-            )
-            embed.add_field(
-                name='Location',
-                value=resp[0]['location'],
-                inline=True
-            )
-            embed.add_field(
-                name='Mode',
-                value=resp[0]['mode'],
-                inline=True
-            )
-            embed.add_field(
-                name='Block Added',
-                value=resp[0]['block_added'],
-                inline=True
-            )
-            embed.add_field(
-                name='Miner Address',
-                value=resp[0]['address'],
-                inline=False
-            )
-            embed.set_footer(
-                text='Provided By: https://api.helium.io'
+        if len(resp) == 0:
+            suggestions = index.suggest(gw_name) if index is not None else ()
+            return await ctx.send(embed=self.hotspot_not_found(words[:3], suggestions))
+
+        embed = Embed(
+            title=f'{" ".join((word.title() for word in words[:3]))}',
+            url=f'https://explorer.helium.com/hotspots/{resp[0]["address"]}',
+        )
+        embed.set_author(
+                name='Helium Hotspot Found!',
+                icon_url=self.hnt_image
             )
+        embed.add_field(
+            name='Location [lat, Lon]',
+            value=f'{round(resp[0]["lat"], 4)}, {round(resp[0]["lng"], 4)}',
+            inline=False
+        )
+        embed.add_field(
+            name='Date Added',
+            value=resp[0]['timestamp_added'][:10],
+            inline=True
+        )
+        embed.add_field(
+            name='Status',
+            value=resp[0]['status']['online'].title(),
+            inline=True
+        )
+        embed.add_field(
+            name='Hotspot Name',
+            value=resp[0]['mode'].title(),
+            inline=True
+        )
+        embed.add_field(
+            name='Location Hex',
+            value=resp[0]['location_hex'],
+            inline=True
+        )
+        embed.add_field(
+            name='Location',
+            value=resp[0]['location'],
+            inline=True
+        )
+        embed.add_field(
+            name='Mode',
+            value=resp[0]['mode'],
+            inline=True
+        )
+        embed.add_field(
+            name='Block Added',
+            value=resp[0]['block_added'],
+            inline=True
+        )
+        embed.add_field(
+            name='Miner Address',
+            value=resp[0]['address'],
+            inline=False
+        )
+        embed.set_footer(
+            text='Provided By: https://api.helium.io'
+        )
 
-            return await ctx.send(embed=embed)
+        return await ctx.send(embed=embed)
 
     @helium.command(name='minerdistance', aliases=['minerdis', 'md'])
     async def miner_distance(self, ctx, hotspot_1, hotspot_2):
@@ -586,30 +989,14 @@ class Helium(commands.Cog, name='Helium'):
         and miles.
         GET https://api.helium.io/v1/hotspots/name/:name
         """
-        async with self.client.session.get(
-            f'{self.api_base}/v1/hotspots/name/{hotspot_1}', headers=self.headers
-        ) as resp1:
-            hs1 = (await resp1.json())['data']
-
-            if len(hs1) == 0:
-                embed = Embed(
-                    description=f'Hotspot with name ```{hotspot_1}``` not found.',
-                    color=random.randint(0, 0xFFFFFF)
-                )
-                embed.set_author(
-                    name='Helium Hotspot Not Found!',
-                    icon_url=self.hnt_image
-                )
-                return await ctx.send(embed=embed)
-
-        async with self.client.session.get(
-            f'{self.api_base}/v1/hotspots/name/{hotspot_2}', headers=self.headers
-        ) as resp2:
-            hs2 = (await resp2.json())['data']
-
-            if len(hs2) == 0:
+        hs1, hs2 = await asyncio.gather(
+            self.hotspots_by_name(hotspot_1.lower()),
+            self.hotspots_by_name(hotspot_2.lower()),
+        )
+        for name, hotspots in ((hotspot_1, hs1), (hotspot_2, hs2)):
+            if len(hotspots) == 0:
                 embed = Embed(
-                    description=f'Hotspot with name ```{hotspot_2}``` not found.',
+                    description=f'Hotspot with name ```{name}``` not found.',
                     color=random.randint(0, 0xFFFFFF)
                 )
                 embed.set_author(
@@ -618,8 +1005,9 @@ class Helium(commands.Cog, name='Helium'):
                 )
                 return await ctx.send(embed=embed)
 
-        kms = round(geodesic((hs1[0]["lat"], hs1[0]["lng"]), (hs2[0]["lat"], hs2[0]["lng"])).km, 2)
-        mis = round(geodesic((hs1[0]["lat"], hs1[0]["lng"]), (hs2[0]["lat"], hs2[0]["lng"])).mi, 2)
+        distance = geodesic((hs1[0]["lat"], hs1[0]["lng"]), (hs2[0]["lat"], hs2[0]["lng"]))
+        kms = round(distance.km, 2)
+        mis = round(distance.mi, 2)
 
         embed = Embed(
             color=random.randint(0, 0xFFFFFF),
@@ -642,6 +1030,61 @@ class Helium(commands.Cog, name='Helium'):
         return await ctx.send(embed=embed)
 
 
+    @helium.command(name='near', aliases=['nearby', 'around'])
+    async def helium_near(self, ctx, *args):
+        """
+        Hotspots near a location, from the local hotspot snapshot
+        helium near <lat> <lon> [radius km]
+        helium near <hotspot name> e.g. tall plum griffin
+        """
+        index = self.hotspot_index
+        if index is None:
+            return await ctx.send('The hotspot map is still loading, please try again later')
+
+        max_radius = self.client.config.get('helium_near_max_km', 50)
+        try:
+            lat, lng = float(args[0]), float(args[1])
+            radius = min(float(args[2]) if len(args) > 2 else 5, max_radius)
+            origin = None
+            title = f'{lat:.4f}, {lng:.4f}'
+        except (IndexError, ValueError):
+            if not args or re.fullmatch(r'[-+.\d]+', args[0]):
+                return await ctx.send(
+                    'Usage: `helium near <lat> <lon> [radius km]` or `helium near <hotspot name>`'
+                )
+            name = '-'.join(word.lower() for word in args[:3])
+            origin = index.find(name)
+            title = ' '.join(word.title() for word in name.split('-'))
+            if origin is None and index.known(name):
+                return await ctx.send(f'{title} has no location asserted')
+            if origin is None:
+                return await ctx.send(embed=self.hotspot_not_found(args[:3], index.suggest(name)))
+            lat, lng = float(index.lat[origin]), float(index.lng[origin])
+            radius = 5
+
+        nearby = [(i, km) for i, km in index.near(lat, lng, radius, limit=26) if i != origin][:25]
+        embed = Embed(
+            color=random.randint(0, 0xFFFFFF),
+            description=f'```{len(nearby)} hotspots within {radius:g} km of {title}```'
+        )
+        embed.set_author(
+            name='Nearby Helium Hotspots',
+            icon_url=self.hnt_image
+        )
+        for position, km in nearby:
+            hotspot = index.record(position)
+            embed.add_field(
+                name=' '.join(word.title() for word in hotspot['name'].split('-')),
+                value=f'{km:,.2f} km | {"Online" if hotspot["online"] else "Offline"} | '
+                      f'[explorer](https://explorer.helium.com/hotspots/{hotspot["address"]})',
+                inline=False
+            )
+        embed.set_footer(
+            text=f'Hotspot map of {len(index):,} hotspots, '
+                 f'{(time.time() - index.built) / 60:,.0f} minutes old'
+        )
+        return await ctx.send(embed=embed)
+
     @helium.command(name='tosolana', aliases=['solanaaddress', 'sa'])
     async def wallet_to_solana(self, ctx, wallet_address):
         """
@@ -681,6 +1124,30 @@ class Helium(commands.Cog, name='Helium'):
     # Cog Tasks
     # ----------------------------------------------
 
+    @tasks.loop(seconds=60)
+    async def network_refresh(self):
+        """keep the network stats commands served from memory"""
+        paths = ('/v1/stats', '/v1/stats/token_supply', '/v1/blocks/height', '/v1/blocks/stats')
+        results = await asyncio.gather(
+            *(self._network_fetch(path) for path in paths), return_exceptions=True
+        )
+        for path, result in zip(paths, results):
+            if isinstance(result, Exception):
+                print(f'Unable to refresh {path}: {result}')
+
+    @tasks.loop(hours=6)
+    async def hotspot_snapshot(self):
+        """rebuild the local hotspot map used by near"""
+        # keep only the indexed columns of each page so full records never pile up
+        chunks = []
+        try:
+            async for page in self.api.pages('/v1/hotspots'):
+                chunks.append(HotspotIndex.chunk(page))
+        except HeliumError as e:
+            print(f'Unable to refresh hotspot map: {e}')
+            return
+        self.hotspot_index = await asyncio.to_thread(HotspotIndex.from_chunks, chunks)
+
 
 async def setup(client):
     """This is called when the cog is loaded via load_extension"""